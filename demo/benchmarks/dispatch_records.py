@@ -0,0 +1,82 @@
+'''
+Benchmark of per-request callback preparation using dispatch records, compared with the previous uncompiled approach
+
+The requests are those of the tests_dash_contract app. Run from the demo directory with
+
+  python benchmarks/dispatch_records.py
+'''
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+
+import django
+django.setup()
+
+# pylint: disable=wrong-import-position
+from dash._utils import split_callback_id, inputs_to_dict
+
+from django_plotly_dash import DjangoDash
+from django_plotly_dash.dash_wrapper import CallbackContext, dispatch_record_for
+from django_plotly_dash.tests_dash_contract import fill_in_test_app, dash_contract_data
+
+
+def main(number=200, repeat=3):
+    'Time the preparation of the contract requests with each approach'
+
+    ddash = DjangoDash(name="DispatchRecordBenchmark")
+    fill_in_test_app(ddash, write=False)
+    app = ddash.as_dash_instance()
+
+    scenarios = [scenario["body"] for scenario in json.load(dash_contract_data.open("r"))]
+
+    def previous_preparation(body, arg_map):
+        inputs = body.get('inputs', [])
+        input_values = inputs_to_dict(inputs)
+        states = body.get('state', [])
+        output = body['output']
+        outputs_list = body.get('outputs') or split_callback_id(output)
+        triggered = [{"prop_id": x, "value": input_values.get(x)} for x in body.get('changedPropIds', [])]
+        context = dict(inputs_list=inputs, inputs=input_values, states_list=states,
+                       states=inputs_to_dict(states), outputs_list=outputs_list,
+                       outputs=outputs_list, triggered=triggered)
+        arg_map['callback_context'] = context
+        single_case = not(output.startswith('..') and output.endswith('..'))
+        outputs = [output] if single_case else output[2:-2].split('...')
+        outputs = [o.split('.') for o in outputs]
+        arg_map['outputs_list'] = body.get('outputs') or split_callback_id(output)
+        callback = app.callback_map[output]["callback"]
+        if callback.expanded is not None:
+            parameters_to_inject = {*callback.expanded, 'outputs_list'}
+            return outputs, {k: v for k, v in arg_map.items() if k in parameters_to_inject}
+        return outputs, arg_map
+
+    def record_preparation(body, arg_map):
+        output = body['output']
+        callback_info = app.callback_map[output]
+        record = dispatch_record_for(callback_info["callback"], callback_info)
+        outputs_list, state_outputs = record.outputs(output)
+        outputs_list = body.get('outputs') or outputs_list
+        arg_map['callback_context'] = CallbackContext(body.get('inputs', []), body.get('state', []),
+                                                      outputs_list, body.get('changedPropIds', []))
+        arg_map['outputs_list'] = outputs_list
+        return state_outputs, record.bind_kwargs(arg_map)
+
+    def run(preparation):
+        for body in scenarios:
+            preparation(body, {'dash_app_id': 'x'})
+
+    previous_time = min(timeit.repeat(lambda: run(previous_preparation), number=number, repeat=repeat))
+    record_time = min(timeit.repeat(lambda: run(record_preparation), number=number, repeat=repeat))
+
+    print("Callback preparation for %i requests: previous %.4fs, dispatch record %.4fs" % (number*len(scenarios),
+                                                                                          previous_time,
+                                                                                          record_time))
+
+
+if __name__ == "__main__":
+    main()
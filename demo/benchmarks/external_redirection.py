@@ -0,0 +1,53 @@
+'''
+Benchmark of the rewriting of responses by the ExternalRedirectionMiddleware, compared with the previous approach
+of one replacement of the whole content for each substitution, across a range of body sizes
+
+Run from the demo directory with
+
+  python benchmarks/external_redirection.py
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+
+import django
+django.setup()
+
+# pylint: disable=wrong-import-position
+from django_plotly_dash.middleware import ExternalRedirectionMiddleware
+
+
+def main(sizes=(10**3, 10**5, 10**7)):
+    'Time the rewriting of pages of each size, containing the substituted links along with other content'
+
+    substitutions = [("https://cdn.example.com/lib-%i.min.js" % i, "/static/lib-%i.min.js" % i) for i in range(20)]
+    substitutions += [('integrity="sha384-%i"' % i, '') for i in range(10)]
+
+    middleware = ExternalRedirectionMiddleware(lambda request: None)
+    middleware.set_substitutions(substitutions)
+
+    def previous_rewrite(content):
+        for source, target in middleware.substitutions:
+            content = content.replace(source, target)
+        return content
+
+    page = "".join('<script src="https://cdn.example.com/lib-%i.min.js" integrity="sha384-%i"></script>' % (i, i)
+                   for i in range(10)).encode("utf-8")
+    filler = b"<div class='row'><span>Some content of the page</span></div>\n" * 1000
+
+    for size in sizes:
+        body = ((page + filler) * (size // len(page + filler) + 1))[:size]
+        assert middleware.rewrite(body) == previous_rewrite(body)
+
+        number = max(1, 10**6 // size)
+        previous_time = min(timeit.repeat(lambda: previous_rewrite(body), number=number, repeat=3)) / number
+        rewrite_time = min(timeit.repeat(lambda: middleware.rewrite(body), number=number, repeat=3)) / number
+        print("Rewriting %i bytes: previous %.6fs, single pass %.6fs" % (size, previous_time, rewrite_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+'''
+Benchmark of the encoding of a large figure with orjson, using the default hook compared with the previous
+approach of cleaning the whole value twice before encoding it
+
+Run from the demo directory with
+
+  python benchmarks/orjson_encoding.py
+'''
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+
+import django
+django.setup()
+
+# pylint: disable=wrong-import-position
+import numpy as np
+import orjson
+import plotly.graph_objs as go
+from django.utils.translation import gettext_lazy
+from plotly.io._json import clean_to_json_compatible
+
+from django_plotly_dash._patches import _json_modules, promise_clean_to_json_compatible, to_json_django_plotly
+
+
+def previous_encoding(value):
+    'Encode a value by cleaning it, then replacing lazy translation strings, and then encoding the result'
+    cleaned = clean_to_json_compatible(value, numpy_allowed=True, datetime_allowed=True, modules=_json_modules())
+    return orjson.dumps(promise_clean_to_json_compatible(cleaned),
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf8")
+
+
+def main(points=20000, number=20, repeat=3):
+    'Time the encoding of a callback response holding a figure with the given number of points per trace'
+
+    figure = go.Figure(data=[go.Scatter(x=np.arange(points), y=list(range(points))),
+                             go.Scatter(x=np.arange(points)[::2], y=np.linspace(0, 1, points // 2))]).to_dict()
+    figure['data'][0]['name'] = gettext_lazy("Series")
+    figure['layout']['title'] = {'text': gettext_lazy("A title")}
+    value = {'response': {'graph': {'figure': figure, 'labels': [gettext_lazy("Label")] * 100}}}
+
+    assert json.loads(to_json_django_plotly(value, engine="orjson")) == json.loads(previous_encoding(value))
+
+    previous_time = min(timeit.repeat(lambda: previous_encoding(value), number=number, repeat=repeat))
+    hook_time = min(timeit.repeat(lambda: to_json_django_plotly(value, engine="orjson"), number=number,
+                                  repeat=repeat))
+
+    print("Encoding of a figure with %i points %i times: previous %.4fs, default hook %.4fs" % (points,
+                                                                                               number,
+                                                                                               previous_time,
+                                                                                               hook_time))
+
+
+if __name__ == "__main__":
+    main()
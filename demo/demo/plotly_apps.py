@@ -463,3 +463,30 @@ def pattern_all(values):
     return str(values)
 
 
+
+
+process_pool_callbacks = DjangoDash("ProcessPoolCallbacks")
+
+process_pool_callbacks.layout = html.Div([
+    dcc.Input(id="sample-size", type="number", value=100000),
+    html.Div(id="summary"),
+    html.Div(id="arguments"),
+    ])
+
+@process_pool_callbacks.expanded_callback(
+    dash.dependencies.Output('summary', 'children'),
+    [dash.dependencies.Input('sample-size', 'value')],
+    use_process_pool=True)
+def process_pool_summary(sample_size):
+    'Aggregate a large frame, in a worker process so as not to hold up other requests'
+    df = pd.DataFrame({'group': [i % 10 for i in range(int(sample_size))],
+                       'value': range(int(sample_size))})
+    return str(df.groupby('group')['value'].sum().to_dict())
+
+@process_pool_callbacks.expanded_callback(
+    dash.dependencies.Output('arguments', 'children'),
+    [dash.dependencies.Input('sample-size', 'value')],
+    use_process_pool=True)
+def process_pool_arguments(sample_size, **kwargs):
+    'Report the expanded arguments that are available within a worker process'
+    return sorted(key for key, value in kwargs.items() if value is not None)
@@ -9,6 +9,7 @@ from dash._callback import (handle_grouped_callback_args,
                             NoUpdate,
                             )
 import collections
+import inspect
 from functools import wraps
 
 from dash.dependencies import (
@@ -30,6 +31,82 @@ from dash._utils import (
 )
 
 from dash import _validate
+from dash import exceptions
+
+from ._patches import StreamedJson
+from .process_pool import run_in_process_pool, picklable_kwargs
+from .util import stream_responses
+
+
+# pylint: disable=too-many-locals,too-many-arguments
+def form_callback_response(output_value, output_spec, output, multi, callback_id, stream=None):
+    '''
+    Form the json response from the value returned by a callback.
+
+    The response is a StreamedJson if stream is true, or if it is None and the stream_responses setting is enabled.
+    '''
+    if isinstance(output_value, NoUpdate):
+        raise PreventUpdate
+
+    if not multi:
+        output_value, output_spec = [output_value], [output_spec]
+        flat_output_values = output_value
+    else:
+        if isinstance(output_value, (list, tuple)):
+            # For multi-output, allow top-level collection to be
+            # list or tuple
+            output_value = list(output_value)
+
+        # Flatten grouping and validate grouping structure
+        flat_output_values = flatten_grouping(output_value, output)
+
+    _validate.validate_multi_return(
+        output_spec, flat_output_values, callback_id
+    )
+
+    component_ids = collections.defaultdict(dict)
+    has_update = False
+    for val, spec in zip(flat_output_values, output_spec):
+        if isinstance(val, NoUpdate):
+            continue
+        for vali, speci in (
+            zip(val, spec) if isinstance(spec, list) else [[val, spec]]
+        ):
+            if not isinstance(vali, NoUpdate):
+                has_update = True
+                id_str = stringify_id(speci["id"])
+                component_ids[id_str][speci["property"]] = vali
+
+    if not has_update:
+        raise PreventUpdate
+
+    response = {"response": component_ids, "multi": True}
+
+    if stream is None:
+        stream = stream_responses()
+
+    if stream:
+        # Encoded as the response is sent, so any failure to encode the values is only found then
+        return StreamedJson(response)
+
+    try:
+        jsonResponse = to_json(response)
+    except TypeError:
+        _validate.fail_callback_output(output_value, output)
+
+    return jsonResponse
+
+
+def invoke_callback(func, func_args, func_kwargs, output_spec, output, multi, callback_id, stream=None):
+    '''
+    Invoke a callback function and form the json response from its value.
+
+    This is a module level function so that it can be run in a worker process.
+    '''
+    # don't touch the comment on the next line - used by debugger
+    output_value = func(*func_args, **func_kwargs)  # %% callback invoked %%
+
+    return form_callback_response(output_value, output_spec, output, multi, callback_id, stream)
 
 
 def register_callback(
@@ -51,6 +128,12 @@ def register_callback(
         insert_output = flatten_grouping(output)
         multi = True
 
+    # Inputs and states are usually a flat list in order, in which case
+    # the grouping of arguments can be skipped when the callback is invoked
+    n_args = grouping_len(inputs_state_indices)
+    flat_args = (isinstance(inputs_state_indices, (list, tuple))
+                 and list(inputs_state_indices) == list(range(n_args)))
+
     output_indices = make_grouping_by_index(output, list(range(grouping_len(output))))
     callback_id = insert_callback(
         callback_list,
@@ -64,66 +147,46 @@ def register_callback(
         prevent_initial_call,
     )
 
-    # pylint: disable=too-many-locals
+    def prepare_args(args, kwargs):
+        'Validate the outputs and arrange the arguments of an invocation of the callback'
+        output_spec = kwargs.pop("outputs_list")
+        _validate.validate_output_spec(insert_output, output_spec, Output)
+
+        if flat_args:
+            if len(args) != n_args:
+                raise exceptions.CallbackException("Inputs do not match callback definition")
+            return output_spec, args, kwargs
+
+        func_args, func_kwargs = _validate.validate_and_group_input_args(
+            args, inputs_state_indices
+        )
+        return output_spec, func_args, {**func_kwargs, **kwargs}
+
     def wrap_func(func):
-        @wraps(func)
-        def add_context(*args, **kwargs):
-            output_spec = kwargs.pop("outputs_list")
-            _validate.validate_output_spec(insert_output, output_spec, Output)
-
-            func_args, func_kwargs = _validate.validate_and_group_input_args(
-                args, inputs_state_indices
-            )
-
-            func_kwargs = {**func_kwargs,
-                           **kwargs}
-
-            # don't touch the comment on the next line - used by debugger
-            output_value = func(*func_args, **func_kwargs)  # %% callback invoked %%
-
-            if isinstance(output_value, NoUpdate):
-                raise PreventUpdate
-
-            if not multi:
-                output_value, output_spec = [output_value], [output_spec]
-                flat_output_values = output_value
-            else:
-                if isinstance(output_value, (list, tuple)):
-                    # For multi-output, allow top-level collection to be
-                    # list or tuple
-                    output_value = list(output_value)
-
-                # Flatten grouping and validate grouping structure
-                flat_output_values = flatten_grouping(output_value, output)
-
-            _validate.validate_multi_return(
-                output_spec, flat_output_values, callback_id
-            )
-
-            component_ids = collections.defaultdict(dict)
-            has_update = False
-            for val, spec in zip(flat_output_values, output_spec):
-                if isinstance(val, NoUpdate):
-                    continue
-                for vali, speci in (
-                    zip(val, spec) if isinstance(spec, list) else [[val, spec]]
-                ):
-                    if not isinstance(vali, NoUpdate):
-                        has_update = True
-                        id_str = stringify_id(speci["id"])
-                        component_ids[id_str][speci["property"]] = vali
-
-            if not has_update:
-                raise PreventUpdate
-
-            response = {"response": component_ids, "multi": True}
-
-            try:
-                jsonResponse = to_json(response)
-            except TypeError:
-                _validate.fail_callback_output(output_value, output)
-
-            return jsonResponse
+        # Set by DjangoDash.callback for callbacks that are to be run in worker processes
+        use_process_pool = getattr(func, 'use_process_pool', False)
+
+        if inspect.iscoroutinefunction(func):
+            # Coroutine callbacks are awaited, so the wrapper is itself a coroutine function
+            @wraps(func)
+            async def add_context(*args, **kwargs):
+                output_spec, func_args, func_kwargs = prepare_args(args, kwargs)
+
+                # don't touch the comment on the next line - used by debugger
+                output_value = await func(*func_args, **func_kwargs)  # %% callback invoked %%
+
+                return form_callback_response(output_value, output_spec, output, multi, callback_id)
+        else:
+            @wraps(func)
+            def add_context(*args, **kwargs):
+                output_spec, func_args, func_kwargs = prepare_args(args, kwargs)
+
+                if use_process_pool:
+                    # The response is encoded in the worker, rather than streamed
+                    return run_in_process_pool(invoke_callback, func, func_args, picklable_kwargs(func_kwargs),
+                                               output_spec, output, multi, callback_id, False)
+
+                return invoke_callback(func, func_args, func_kwargs, output_spec, output, multi, callback_id)
 
         callback_map[callback_id]["callback"] = add_context
 
@@ -36,15 +36,171 @@ from _plotly_utils.optional_imports import get_module
 from django.utils.encoding import force_str
 from django.utils.functional import Promise
 
+from ._settings import json_engine, typed_array_threshold
+
+try:
+    from _plotly_utils.utils import is_skipped_key, to_typed_array_spec
+except ImportError:
+    # Versions of plotly before 6.0 do not support typed arrays
+    is_skipped_key = to_typed_array_spec = None
+
+
+def _typed_array_threshold():
+    return typed_array_threshold() if to_typed_array_spec is not None else None
+
+
+def typed_array_spec(obj, threshold):
+    """
+    Return the plotly.js typed array representation of a numpy array or pandas series, or None if it should be
+    sent as a list
+
+    Arrays are only converted if they have at least threshold elements. Arrays whose dtype has no typed array
+    equivalent are always sent as lists.
+    """
+    np = get_module("numpy", should_load=False)
+    if np is None:
+        return None
+
+    pd = get_module("pandas", should_load=False)
+    if pd is not None and isinstance(obj, (pd.Series, pd.Index)):
+        obj = obj.to_numpy()
+
+    if not isinstance(obj, np.ndarray) or obj.size < max(threshold, 1):
+        return None
+
+    spec = to_typed_array_spec(obj)
+    return spec if isinstance(spec, dict) else None
+
+
+def _trace_typed_arrays(trace, threshold):
+    # Convert the arrays of a trace, and of nested attributes such as marker, that plotly.js accepts as typed arrays
+    if not isinstance(trace, dict):
+        return trace
+    converted = None
+    for key, value in trace.items():
+        if is_skipped_key(key):
+            continue
+        if isinstance(value, dict):
+            new_value = _trace_typed_arrays(value, threshold)
+        else:
+            new_value = typed_array_spec(value, threshold)
+            if new_value is None:
+                new_value = value
+        if new_value is not value:
+            if converted is None:
+                converted = dict(trace)
+            converted[key] = new_value
+    return converted if converted is not None else trace
+
+
+def with_typed_arrays(obj, threshold=None):
+    """
+    Return obj with the large arrays of the traces of any figures it holds replaced by typed arrays
+
+    Figures are the dict values of 'figure' keys, such as the figure property of a dcc.Graph in a layout or a
+    callback response. Only dicts are searched for them, so values inside lists are left unchanged, as are
+    arrays outside of the data of a figure. Dicts are copied, rather than altered, where they hold converted
+    arrays. The value is returned unchanged if the typed_array_threshold setting is not present.
+    """
+    if threshold is None:
+        threshold = _typed_array_threshold()
+        if threshold is None:
+            return obj
+    if not isinstance(obj, dict):
+        return obj
+
+    converted = None
+    for key, value in obj.items():
+        if key == "figure" and isinstance(value, dict) and isinstance(value.get("data"), (list, tuple)):
+            traces = [_trace_typed_arrays(trace, threshold) for trace in value["data"]]
+            new_value = dict(value, data=traces)
+        else:
+            new_value = with_typed_arrays(value, threshold)
+        if new_value is not value:
+            if converted is None:
+                converted = dict(obj)
+            converted[key] = new_value
+    return converted if converted is not None else obj
+
+
+def _plotly_json(obj, threshold):
+    # The plotly JSON representation of a Dash component or plotly object, with typed arrays for its figures
+    value = obj.to_plotly_json()
+    return with_typed_arrays(value, threshold) if threshold is not None else value
+
+
+def orjson_options():
+    "Return the options used with orjson.dumps"
+    orjson = get_module("orjson", should_load=True)
+    return orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+JSON_ENGINES = ("json", "orjson",)
+
+
+def selected_engine():
+    '''
+    Return the engine to use, either json or orjson.
+
+    The json_engine setting, if present, takes precedence over the default engine configured for plotly.
+    '''
+    engine = json_engine()
+    if engine is None:
+        engine = config.default_engine
+
+    if engine == "auto":
+        return "orjson" if get_module("orjson", should_load=True) is not None else "json"
+    if engine not in JSON_ENGINES:
+        raise ValueError("Invalid json engine: %s" % engine)
+    return engine
+
 
 class DjangoPlotlyJSONEncoder(PlotlyJSONEncoder):
     """Augment the PlotlyJSONEncoder class with Django delayed processing"""
     def default(self, obj):
         if isinstance(obj, Promise):
             return force_str(obj)
+        threshold = _typed_array_threshold()
+        if threshold is not None and hasattr(obj, "to_plotly_json"):
+            return _plotly_json(obj, threshold)
         return super().default(obj)
 
 
+def _json_modules():
+    return {
+        "sage_all": get_module("sage.all", should_load=False),
+        "np": get_module("numpy", should_load=False),
+        "pd": get_module("pandas", should_load=False),
+        "image": get_module("PIL.Image", should_load=False),
+    }
+
+
+def orjson_default(obj):
+    """
+    Convert a value that orjson cannot encode natively
+
+    This is used as the default hook of orjson.dumps, and so is only called for the individual values
+    that need it, such as lazy translation strings, plotly and Dash objects, and pandas, numpy and PIL
+    values that are not directly supported. Containers in the returned value are encoded by orjson, which
+    calls this function again for any nested values that also need conversion.
+    """
+    if isinstance(obj, Promise):
+        return force_str(obj)
+
+    try:
+        return _plotly_json(obj, _typed_array_threshold())
+    except AttributeError:
+        pass
+
+    cleaned = clean_to_json_compatible(obj,
+                                       numpy_allowed=True,
+                                       datetime_allowed=True,
+                                       modules=_json_modules())
+    if cleaned is obj:
+        raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+    return cleaned
+
+
 def promise_clean_to_json_compatible(obj):
 
     if isinstance(obj, dict):
@@ -57,14 +213,36 @@ def promise_clean_to_json_compatible(obj):
     if isinstance(obj, Promise):
         return force_str(obj)
 
-    #try:
-    #    return obj.to_plotly_json()
-    #except AttributeError:
-    #    pass
-
     return obj
 
 
+def orjson_dumps(obj, option=None):
+    """
+    Return the JSON representation of obj, encoded with orjson, as bytes
+
+    Values that orjson cannot encode even with the help of orjson_default, such as lazy translation
+    strings used as dict keys, are handled by cleaning the whole of obj and encoding the result.
+    """
+    orjson = get_module("orjson", should_load=True)
+    if option is None:
+        option = orjson_options()
+
+    # Try without cleaning
+    try:
+        return orjson.dumps(obj, default=orjson_default, option=option)
+    except TypeError:
+        pass
+
+    cleaned = clean_to_json_compatible(obj,
+                                       numpy_allowed=True,
+                                       datetime_allowed=True,
+                                       modules=_json_modules())
+
+    cleaned = promise_clean_to_json_compatible(cleaned)
+
+    return orjson.dumps(cleaned, default=orjson_default, option=option)
+
+
 def to_json_django_plotly(plotly_object, pretty=False, engine=None):
     """
     Convert a plotly/Dash object to a JSON string representation
@@ -83,8 +261,8 @@ def to_json_django_plotly(plotly_object, pretty=False, engine=None):
           - "json" for an engine based on the built-in Python json module
           - "orjson" for a faster engine that requires the orjson package
           - "auto" for the "orjson" engine if available, otherwise "json"
-        If not specified, the default engine is set to the current value of
-        plotly.io.json.config.default_engine.
+        If not specified, the engine selected for django-plotly-dash is used,
+        which defaults to the current value of plotly.io.json.config.default_engine.
 
     Returns
     -------
@@ -99,7 +277,7 @@ def to_json_django_plotly(plotly_object, pretty=False, engine=None):
 
     # Determine json engine
     if engine is None:
-        engine = config.default_engine
+        engine = selected_engine()
 
     if engine == "auto":
         if orjson is not None:
@@ -109,13 +287,6 @@ def to_json_django_plotly(plotly_object, pretty=False, engine=None):
     elif engine not in ["orjson", "json"]:
         raise ValueError("Invalid json engine: %s" % engine)
 
-    modules = {
-        "sage_all": get_module("sage.all", should_load=False),
-        "np": get_module("numpy", should_load=False),
-        "pd": get_module("pandas", should_load=False),
-        "image": get_module("PIL.Image", should_load=False),
-    }
-
     # Dump to a JSON string and return
     # --------------------------------
     if engine == "json":
@@ -126,10 +297,10 @@ def to_json_django_plotly(plotly_object, pretty=False, engine=None):
             # Remove all whitespace
             opts["separators"] = (",", ":")
 
-        return json.dumps(plotly_object, cls=DjangoPlotlyJSONEncoder, **opts)
+        return json.dumps(with_typed_arrays(plotly_object), cls=DjangoPlotlyJSONEncoder, **opts)
     elif engine == "orjson":
         config.validate_orjson()
-        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        opts = orjson_options()
 
         if pretty:
             opts |= orjson.OPT_INDENT_2
@@ -140,23 +311,96 @@ def to_json_django_plotly(plotly_object, pretty=False, engine=None):
             plotly_object = plotly_object.to_plotly_json()
         except AttributeError:
             pass
+        plotly_object = with_typed_arrays(plotly_object)
 
-        # Try without cleaning
-        try:
-            return orjson.dumps(plotly_object, option=opts).decode("utf8")
-        except TypeError:
-            pass
+        return orjson_dumps(plotly_object, opts).decode("utf8")
+
+# Number of items of a sequence that are encoded together when streaming
+STREAM_CHUNK_ITEMS = 10000
+
+
+def _is_large(obj, chunk_items, np):
+    # Whether obj is a component, or holds a sequence of more than chunk_items items, and so should be walked
+    if hasattr(obj, "to_plotly_json"):
+        return True
+    if isinstance(obj, dict):
+        return any(_is_large(value, chunk_items, np) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return len(obj) > chunk_items or any(_is_large(item, chunk_items, np) for item in obj)
+    return np is not None and isinstance(obj, np.ndarray) and obj.size > chunk_items
+
+
+def _json_encoder(engine):
+    # Return a function that encodes a value as a compact JSON string with the given engine
+    if engine == "orjson":
+        config.validate_orjson()
+        option = orjson_options()
+        return lambda obj: orjson_dumps(obj, option).decode("utf8")
+    return lambda obj: json.dumps(obj, cls=DjangoPlotlyJSONEncoder, separators=(",", ":"))
+
+
+def iter_json_django_plotly(plotly_object, chunk_items=STREAM_CHUNK_ITEMS):
+    """
+    Generate the JSON representation of a plotly/Dash object as a sequence of strings
+
+    Dicts, lists and arrays that hold more than chunk_items values are walked, and large sequences are
+    encoded a slice at a time, so that the whole representation is never held in memory at once. Everything
+    else is encoded in one piece in the same way as to_json_django_plotly.
+    """
+    np = get_module("numpy", should_load=False)
+    threshold = _typed_array_threshold()
+    if threshold is not None:
+        plotly_object = with_typed_arrays(plotly_object, threshold)
+
+    yield from _iter_json(plotly_object, chunk_items, np, threshold, _json_encoder(selected_engine()))
+
+
+def _iter_json(plotly_object, chunk_items, np, threshold, encode):
+    try:
+        plotly_object = _plotly_json(plotly_object, threshold)
+    except AttributeError:
+        pass
+
+    if not _is_large(plotly_object, chunk_items, np):
+        yield encode(plotly_object)
+        return
+
+    if isinstance(plotly_object, dict):
+        yield "{"
+        for i, (key, value) in enumerate(plotly_object.items()):
+            yield "%s%s:" % ("," if i else "", json.dumps(force_str(key)))
+            yield from _iter_json(value, chunk_items, np, threshold, encode)
+        yield "}"
+        return
+
+    yield "["
+    for start in range(0, len(plotly_object), chunk_items):
+        chunk = plotly_object[start:start+chunk_items]
+        prefix = "," if start else ""
+        if np is not None and isinstance(chunk, np.ndarray) and chunk.ndim == 1:
+            yield prefix + encode(chunk)[1:-1]
+        elif not any(_is_large(item, chunk_items, np) for item in chunk):
+            yield prefix + encode(list(chunk))[1:-1]
+        else:
+            for i, item in enumerate(chunk):
+                yield prefix if i == 0 else ","
+                yield from _iter_json(item, chunk_items, np, threshold, encode)
+    yield "]"
+
+
+class StreamedJson:
+    """A value to be sent as JSON, which is encoded a piece at a time as the response is streamed"""
+    def __init__(self, value):
+        self.value = value
 
-        cleaned = clean_to_json_compatible(
-            plotly_object,
-            numpy_allowed=True,
-            datetime_allowed=True,
-            modules=modules,
-        )
+    def __iter__(self):
+        for chunk in iter_json_django_plotly(self.value):
+            yield chunk.encode("utf-8")
 
-        cleaned = promise_clean_to_json_compatible(cleaned)
+    def to_json(self):
+        "Return the JSON representation as a single string"
+        return to_json_django_plotly(self.value)
 
-        return orjson.dumps(cleaned, option=opts).decode("utf8")
 
 import plotly.io.json
 plotly.io.json.to_json_plotly = to_json_django_plotly
@@ -0,0 +1,46 @@
+'''
+Access to the PLOTLY_DASH settings
+
+This module has no dependencies on the rest of django-plotly-dash, so that the settings can be read
+by the modules that everything else depends upon.
+
+Copyright (c) 2018 Gibbs Consulting and others - see CONTRIBUTIONS.md
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+from django.conf import settings
+
+
+def _get_settings():
+    try:
+        the_settings = settings.PLOTLY_DASH
+    except AttributeError:
+        the_settings = None
+
+    return the_settings if the_settings else {}
+
+def json_engine():
+    'Return the engine used for JSON serialization, one of json, orjson or auto, or None to use the plotly default'
+    return _get_settings().get('json_engine', None)
+
+def typed_array_threshold():
+    'Return the minimum size of numpy arrays sent as plotly.js typed arrays, or None if they are always sent as lists'
+    return _get_settings().get('typed_array_threshold', None)
@@ -30,3 +30,6 @@ class DjangoPlotlyDashConfig(AppConfig):
     name = 'django_plotly_dash'
     verbose_name = "Django Plotly Dash"
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from . import checks # pylint: disable=unused-import,import-outside-toplevel
@@ -0,0 +1,51 @@
+'''
+System checks of the configuration of django-plotly-dash
+
+Copyright (c) 2018 Gibbs Consulting and others - see CONTRIBUTIONS.md
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .util import dash_app_cache_name, dash_app_cache_timeout
+
+
+@checks.register(checks.Tags.caches)
+def check_dash_app_cache(app_configs=None, **kwargs): # pylint: disable=unused-argument
+    '''
+    Check that DashApp instances are only cached in a cache shared by all processes.
+
+    Each process has its own local memory cache, so that a change to the state of an app made by one process
+    would not be seen by the others, which could then overwrite it with their own stale copy.
+    '''
+    if dash_app_cache_timeout() is None:
+        return []
+
+    name = dash_app_cache_name()
+    if isinstance(caches[name], LocMemCache):
+        return [checks.Error("The cache_timeout_dash_apps setting requires a cache shared by all processes, "
+                             "but the %r cache is local to each process" % name,
+                             hint="Use a shared cache backend, such as Redis or Memcached, for the cache named "
+                                  "by the dash_app_cache setting. If the application is only ever served by a "
+                                  "single process, this check can be silenced.",
+                             id="django_plotly_dash.E001")]
+    return []
@@ -22,13 +22,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
 
-import json
-
 from channels.generic.websocket import WebsocketConsumer
 from channels.generic.http import AsyncHttpConsumer
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
+from . import serializer
+
 def _form_pipe_channel_name(channel_name):
     return "dpd_pipe_%s" % channel_name
 
@@ -71,7 +71,7 @@ class MessageConsumer(WebsocketConsumer):
 
     def pipe_value(self, message):
         'Send a new value into the ws pipe'
-        jmsg = json.dumps(message)
+        jmsg = serializer.dumps(message)
         self.send(jmsg)
 
     def update_pipe_channel(self, uid, channel_name, label): # pylint: disable=unused-argument
@@ -90,7 +90,7 @@ class MessageConsumer(WebsocketConsumer):
                 async_to_sync(self.channel_layer.group_add)(pipe_group_name, self.channel_name)
 
     def receive(self, text_data): # pylint: disable=arguments-differ
-        message = json.loads(text_data)
+        message = serializer.loads(text_data)
 
         message_type = message.get('type', 'unknown_type')
         if message_type == 'connection_triplet':
@@ -128,7 +128,7 @@ class PokePipeConsumer(AsyncHttpConsumer):
         user = self.scope.get('user', None)
         as_utf = body.decode('utf-8')
         try:
-            incoming_message = json.loads(as_utf)
+            incoming_message = serializer.loads(as_utf)
 
             # Get label value and channel_name out of the body
             channel_name = incoming_message.get('channel_name', 'UNNAMED_CHANNEL')
@@ -24,15 +24,25 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 '''
+import copy
+import hashlib
+import importlib
 import inspect
 import itertools
 import json
+import sys
+import threading
 import warnings
-from typing import Dict, List, Callable
+from collections import OrderedDict
+from functools import cached_property
+from typing import Callable
+
+from asgiref.sync import async_to_sync, sync_to_async
 
 import dash
 from dash import Dash, dependencies
 from dash._utils import split_callback_id, inputs_to_dict
+from django.core.cache import caches
 from django.urls import reverse
 from django.utils.text import slugify
 from flask import Flask
@@ -40,54 +50,226 @@ from flask import Flask
 from .app_name import app_name, main_view_label
 from .middleware import EmbeddedHolder
 from .util import serve_locally as serve_locally_setting
-from .util import stateless_app_lookup_hook
-from .util import static_asset_path, DjangoPlotlyJSONEncoder
-
-try:
-    from dataclasses import dataclass
-
-    @dataclass(frozen=True)
-    class CallbackContext:
-        inputs_list : List
-        inputs: Dict
-        states_list: List
-        states: Dict
-        outputs_list: List
-        outputs: Dict
-        triggered: List
-
-except:
-    # Not got python 3.7 or dataclasses yet
-    class CallbackContext:
-        def __init__(self, **kwargs):
-            self._args = kwargs
-
-        @property
-        def inputs_list(self):
-            return self._args['inputs_list']
-
-        @property
-        def inputs(self):
-            return self._args['inputs']
-
-        @property
-        def states_list(self):
-            return self._args['states_list']
-
-        @property
-        def states(self):
-            return self._args['states']
-
-        @property
-        def outputs(self):
-            return self._args['outputs']
-
-        @property
-        def outputs_list(self):
-            return self._args['outputs_list']
-        @property
-        def triggered(self):
-            return self._args['triggered']
+from .util import instance_cache_size, cache_timeout_callbacks, callback_cache_name
+from .util import batch_updates, static_path, direct_static_urls, component_static_url
+from .util import stateless_app_lookup_hook, app_modules
+from .util import static_asset_path
+from ._patches import StreamedJson
+from . import serializer
+
+class CallbackContext:
+    '''
+    Context of a single callback invocation, made available to expanded callbacks.
+
+    Values derived from the request, such as the input dictionaries, are only formed
+    when first accessed.
+    '''
+    def __init__(self, inputs_list, states_list, outputs_list, changed_props):
+        self.inputs_list = inputs_list
+        self.states_list = states_list
+        self.outputs_list = outputs_list
+        self._changed_props = changed_props
+
+    @cached_property
+    def inputs(self):
+        'Dictionary of input values keyed by component id and property'
+        return inputs_to_dict(self.inputs_list)
+
+    @cached_property
+    def states(self):
+        'Dictionary of state values keyed by component id and property'
+        return inputs_to_dict(self.states_list)
+
+    @property
+    def outputs(self):
+        'Output specification of the callback'
+        return self.outputs_list
+
+    @cached_property
+    def triggered(self):
+        'List of the inputs that triggered the callback, along with their values'
+        input_values = self.inputs
+        return [{"prop_id": x, "value": input_values.get(x)} for x in self._changed_props]
+
+    def __repr__(self):
+        return "CallbackContext(inputs_list=%r, inputs=%r, states_list=%r, states=%r, outputs_list=%r, outputs=%r, triggered=%r)" % (
+            self.inputs_list, self.inputs, self.states_list, self.states, self.outputs_list, self.outputs, self.triggered)
+
+
+# Arguments specific to the user or request, which prevent the results of a callback being memoized
+UNMEMOIZABLE_ARGUMENTS = frozenset(['user', 'session_state', 'request', 'dash_app',])
+
+# Static script that coalesces callback requests into batched requests
+BATCH_UPDATES_SCRIPT = "django_plotly_dash/js/batch_updates.js"
+
+# Version of the memoized results of callbacks
+CALLBACK_CACHE_VERSION = 1
+
+
+class CallbackDispatchRecord:
+    '''
+    Details of a callback that are needed to dispatch a request to it.
+
+    A record is compiled once, when the callback is registered, so that the
+    processing of each request only has to bind the supplied values.
+    '''
+    def __init__(self, expanded, n_inputs, n_states, multi, memoize=None):
+        self.expanded = expanded
+        self.n_inputs = n_inputs
+        self.n_states = n_states
+        self.multi = multi
+
+        # Arguments to inject, or None if the callback takes all of them through **kwargs
+        if expanded is None:
+            self.injected = None
+        else:
+            self.injected = frozenset(expanded) | {'outputs_list'}
+
+        # Timeout for memoized results, or None if the results of the callback are not memoized.
+        # Callbacks passed arguments specific to the user or request cannot be memoized
+        if self.injected is None or self.injected & UNMEMOIZABLE_ARGUMENTS:
+            self.memoize_timeout = None
+        elif memoize is True:
+            self.memoize_timeout = cache_timeout_callbacks()
+        elif memoize:
+            self.memoize_timeout = memoize
+        else:
+            self.memoize_timeout = None
+
+        self._outputs = {}
+
+    @staticmethod
+    def from_callback(func, inputs, state, output, memoize=None):
+        'Compile the record for a callback function'
+        return CallbackDispatchRecord(expanded=DjangoDash.get_expanded_arguments(func, inputs, state),
+                                      n_inputs=len(inputs or []),
+                                      n_states=len(state or []),
+                                      multi=isinstance(output, (list, tuple)),
+                                      memoize=memoize)
+
+    def memo_key(self, app_uid, body, arg_map):
+        '''
+        Return the key of the memoized result of the callback for the request body, or None if it is not memoized.
+
+        The key is formed from the app, the callback and the canonical form of the values it is passed.
+        '''
+        if self.memoize_timeout is None:
+            return None
+        content = json.dumps([app_uid,
+                              body['output'],
+                              body.get('inputs', []),
+                              body.get('state', []),
+                              body.get('outputs', None),
+                              body.get('changedPropIds', []),
+                              arg_map.get('dash_app_id', None) if 'dash_app_id' in self.injected else None,
+                             ],
+                             sort_keys=True, separators=(',', ':'))
+        return "dpd-callback-%s" % hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def outputs(self, output):
+        '''
+        Return the outputs list, and a list of (id, property) pairs, for the callback id output.
+
+        The callback id is parsed on first use and the result retained.
+        '''
+        parsed = self._outputs.get(output, None)
+        if parsed is None:
+            outputs_list = split_callback_id(output)
+            if isinstance(outputs_list, dict):
+                output_items = [outputs_list,]
+            else:
+                output_items = outputs_list
+            parsed = (outputs_list,
+                      [(item['id'], item['property']) for item in output_items])
+            self._outputs[output] = parsed
+        return parsed
+
+    def bind_kwargs(self, arg_map):
+        '''
+        Return the keyword arguments, out of those in arg_map, to pass to the callback.
+
+        Any lazy arguments are only produced if they are passed to the callback.
+        '''
+        if self.injected is None:
+            return {k: resolve_argument(v) for k, v in arg_map.items()}
+        return {k: resolve_argument(v) for k, v in arg_map.items() if k in self.injected}
+
+
+def memoized_callback_result(memo_key):
+    'Return the memoized response of a callback, or None if there is none'
+    if memo_key is None:
+        return None
+    return caches[callback_cache_name()].get(memo_key, version=CALLBACK_CACHE_VERSION)
+
+
+def memoize_callback_result(memo_key, response, timeout):
+    '''
+    Store the response of a callback, if it is memoized, and return the response to send
+
+    A streamed response is formed in memory so that it can be stored, and so is not streamed.
+    '''
+    if memo_key is None:
+        return response
+    if isinstance(response, StreamedJson):
+        response = response.to_json()
+    if isinstance(response, str):
+        caches[callback_cache_name()].set(memo_key, response, timeout, version=CALLBACK_CACHE_VERSION)
+    return response
+
+
+class LazyArgument:
+    '''
+    An extra argument for callbacks, produced by calling func when first needed.
+    '''
+    def __init__(self, func):
+        self._func = func
+        self._value = None
+        self.evaluated = False
+
+    @property
+    def value(self):
+        'The value of the argument, producing it if needed'
+        if not self.evaluated:
+            self._value = self._func()
+            self.evaluated = True
+        return self._value
+
+
+def resolve_argument(value):
+    'Return the value of an extra argument, producing it if it is lazy'
+    if isinstance(value, LazyArgument):
+        return value.value
+    return value
+
+
+def dispatch_record_for(callback, callback_info):
+    '''
+    Locate the dispatch record of a registered callback.
+
+    Callbacks registered through a DjangoDash instance carry a record, and
+    one is formed and attached on first use for any others.
+    '''
+    record = getattr(callback, 'dispatch_record', None)
+    if record is None:
+        record = CallbackDispatchRecord(expanded=getattr(callback, 'expanded', None),
+                                        n_inputs=len(callback_info['inputs']),
+                                        n_states=len(callback_info['state']),
+                                        multi=False)
+        callback.dispatch_record = record
+    return record
+
+
+class _LazyJson:
+    """A class to allow delayed the evaluation of a dict (returned by `func`)
+     till the first get(...) is called on the dict."""
+
+    def __init__(self, func):
+        self._root_value = func
+
+    def get(self, item, default):
+        if isinstance(self._root_value, Callable):
+            self._root_value = self._root_value()
+        return self._root_value.get(item, default)
 
 
 uid_counter = 0
@@ -102,6 +284,24 @@ def add_usable_app(name, app):
     usable_apps[name] = app
     return name
 
+_app_modules_loaded = False
+
+def load_app_modules():
+    '''
+    Import the modules listed in the app_modules setting, so that the apps they define are registered.
+
+    Return True if the modules have been imported by this call.
+    '''
+    global _app_modules_loaded # pylint: disable=global-statement
+    if _app_modules_loaded:
+        return False
+    _app_modules_loaded = True
+
+    module_names = app_modules()
+    for module_name in module_names or []:
+        importlib.import_module(module_name)
+    return bool(module_names)
+
 def all_apps():
     'Return a dictionary of all locally registered apps with the slug name as key'
     return usable_apps
@@ -117,6 +317,9 @@ def get_local_stateless_by_name(name):
     '''
     sa = usable_apps.get(name, None)
 
+    if not sa and load_app_modules():
+        sa = usable_apps.get(name, None)
+
     if not sa:
 
         global _stateless_app_lookup_func # pylint: disable=global-statement
@@ -135,14 +338,20 @@ def get_local_stateless_by_name(name):
 
 class Holder:
     'Helper class for holding configuration options'
-    def __init__(self):
+    def __init__(self, on_change=None):
         self.items = []
+        self._on_change = on_change
     def append_css(self, stylesheet):
         'Add extra css file name to component package'
         self.items.append(stylesheet)
+        self._changed()
     def append_script(self, script):
         'Add extra script file name to component package'
         self.items.append(script)
+        self._changed()
+    def _changed(self):
+        if self._on_change:
+            self._on_change()
 
 
 class DjangoDash:
@@ -173,12 +382,21 @@ class DjangoDash:
             self._uid = "djdash_%i" % uid_counter
         else:
             self._uid = name
+
+        # Dash instances are expensive to construct, so keep recently used ones, keyed
+        # by (ndid, base_pathname). Any change to the app definition invalidates them.
+        self._instance_cache = OrderedDict()
+        self._instance_cache_lock = threading.Lock()
+        self._instance_generation = 0
+        self._layout_cache = {}
+        self._dependencies_entry = None
+
         self.layout = None
         self._callback_sets = []
         self._clientside_callback_sets = []
 
-        self.css = Holder()
-        self.scripts = Holder()
+        self.css = Holder(on_change=self.invalidate_instance_cache)
+        self.scripts = Holder(on_change=self.invalidate_instance_cache)
 
         add_usable_app(self._uid,
                        self)
@@ -210,15 +428,42 @@ class DjangoDash:
             else:
                 self.css.append_script({'external_url':[bootstrap_source,],})
 
-        # Remember some caller info for static files
-        caller_frame = inspect.stack()[1]
-        self.caller_module = inspect.getmodule(caller_frame[0])
+        # Remember some caller info for static files. The frame is looked up directly, as
+        # inspect.stack() reads the source of every frame in the stack
+        caller_frame = sys._getframe(1) # pylint: disable=protected-access
+        self.caller_module = sys.modules.get(caller_frame.f_globals.get('__name__', None), None)
+        if self.caller_module is None:
+            self.caller_module = inspect.getmodule(caller_frame)
         try:
             self.caller_module_location = inspect.getfile(self.caller_module)
         except:
             self.caller_module_location = None
         self.assets_folder = "assets"
 
+    @property
+    def layout(self):
+        'Layout of the app, as supplied by the user'
+        return self._layout
+
+    @layout.setter
+    def layout(self, value):
+        self._layout = value
+        self.invalidate_instance_cache()
+
+    def invalidate_instance_cache(self):
+        '''
+        Discard any cached Dash instances of this app.
+
+        This is called automatically when the layout, callbacks or resources of the app are
+        changed through its own interface, and can also be called directly if, for example,
+        the layout is modified in place.
+        '''
+        with self._instance_cache_lock:
+            self._instance_cache.clear()
+            self._instance_generation += 1
+            self._layout_cache = {}
+            self._dependencies_entry = None
+
     def get_asset_static_url(self, asset_path):
         module_name = self.caller_module.__name__
         return static_asset_path(module_name, asset_path)
@@ -238,6 +483,55 @@ class DjangoDash:
     def have_current_state_entry(self, wid, key):
         'Do nothing impl - only matters if state present'
         pass
+    def prefetch_current_state_entries(self, wids):
+        'Do nothing impl - only matters if state present'
+        pass
+
+    def dependencies_response_data(self, specific_identifier=None, cache_id=None):
+        '''
+        Return the serialized callback dependencies, their mimetype and an ETag for them.
+
+        The dependencies of an app do not change once it is defined, and are the same for
+        every instance of it, so they are serialized once and then retained.
+        '''
+        entry = self._dependencies_entry
+        if entry is None:
+            ndid, base_pathname = self.get_base_pathname(specific_identifier, cache_id)
+            app = self.form_dash_instance(ndid=ndid, base_pathname=base_pathname)
+            with app.app_context():
+                resp = app.locate_endpoint_function('dash-dependencies')()
+            etag = '"%s"' % hashlib.sha1(resp.data).hexdigest()
+            entry = (resp.data, resp.mimetype, etag)
+            self._dependencies_entry = entry
+        return entry
+
+    def layout_hash(self):
+        'Return a hash of the serialized base layout, or None if the layout is formed by a function'
+        if callable(self.layout):
+            return None
+        layout_hash = self._layout_cache.get('hash', None)
+        if layout_hash is None:
+            layout_hash = self.as_dash_instance().layout_hash()
+        return layout_hash
+
+    def layout_validators(self, initial_arguments=None, last_modified=None):
+        '''
+        Return an ETag for the initial layout, and the time it was last modified, or (None, None).
+
+        The ETag is derived from the base layout, the time of last modification of any application
+        state, and any initial arguments. Layouts formed by a function do not have an ETag.
+        '''
+        layout_hash = self.layout_hash()
+        if layout_hash is None:
+            return None, None
+
+        content = [layout_hash]
+        if last_modified is not None:
+            content.append(last_modified.isoformat())
+        if initial_arguments:
+            content.append(serializer.dumps(initial_arguments))
+        etag = '"%s"' % hashlib.sha1("|".join(content).encode('utf-8')).hexdigest()
+        return etag, last_modified
 
     def get_base_pathname(self, specific_identifier, cache_id):
         'Base path name of this instance, taking into account any state or statelessness'
@@ -271,8 +565,38 @@ class DjangoDash:
         if ndid is None:
             ndid = self._uid
 
+        rd = self._cached_dash_instance(ndid, base_pathname)
+
+        # Per-request values are applied to a lightweight copy of the shared instance
+        return rd.with_replacements(replacements)
+
+    def _cached_dash_instance(self, ndid, base_pathname):
+        'Return a shared Dash instance for this ndid and base path, constructing it if needed'
+
+        key = (ndid, base_pathname)
+        with self._instance_cache_lock:
+            rd = self._instance_cache.get(key, None)
+            if rd is not None:
+                self._instance_cache.move_to_end(key)
+                return rd
+            generation = self._instance_generation
+
+        rd = self._build_dash_instance(ndid, base_pathname)
+
+        max_size = instance_cache_size()
+        if max_size > 0:
+            with self._instance_cache_lock:
+                # Only retain the instance if the app has not been changed while building it
+                if generation == self._instance_generation:
+                    self._instance_cache[key] = rd
+                    while len(self._instance_cache) > max_size:
+                        self._instance_cache.popitem(last=False)
+        return rd
+
+    def _build_dash_instance(self, ndid, base_pathname):
+        'Construct a new Dash instance, without any replacement values'
+
         rd = WrappedDash(base_pathname=base_pathname,
-                         replacements=replacements,
                          ndid=ndid,
                          serve_locally=self._serve_locally,
                          external_stylesheets=self.external_stylesheets,
@@ -282,6 +606,9 @@ class DjangoDash:
         rd.layout = self.layout
         rd.config['suppress_callback_exceptions'] = self._suppress_callback_exceptions
 
+        # Serialized layouts are shared between all instances of this app
+        rd.set_layout_cache(self._layout_cache)
+
         for cb, func in self._callback_sets:
             rd.callback(**cb)(func)
         for cb in self._clientside_callback_sets:
@@ -328,7 +655,16 @@ class DjangoDash:
         If the function has a *args => expanded arguments matching parameters after the *args are injected.
         Otherwise, take all arguments beyond the one provided by Dash (based on the Inputs/States provided).
 
+        If use_process_pool is True, the callback is run in a pool of worker processes. The function must then be
+        defined at module level, and it is passed copies of the expanded arguments that can be pickled.
+
+        If memoize is True, or a timeout in seconds, then the response of the callback is cached and reused for
+        requests with the same values. Callbacks passed the user, session_state, request or dash_app arguments
+        are never memoized.
+
         '''
+        use_process_pool = _kwargs.pop('use_process_pool', False)
+        memoize = _kwargs.pop('memoize', None)
 
         output, inputs, state, prevent_initial_call = dependencies.handle_callback_args(
             _args, _kwargs
@@ -340,12 +676,18 @@ class DjangoDash:
                         'prevent_initial_call': prevent_initial_call}
 
         def wrap_func(func):
+            if use_process_pool:
+                if inspect.iscoroutinefunction(func):
+                    raise TypeError("Coroutine callbacks cannot be run in the process pool")
+                func.use_process_pool = True
             self._callback_sets.append((callback_set, func))
+            self.invalidate_instance_cache()
             # add an expanded attribute to the function with the information to use in dispatch_with_args
             # to inject properly only the expanded arguments the function can accept
             # if .expanded is None => inject all
             # if .expanded is a list => inject only
-            func.expanded = DjangoDash.get_expanded_arguments(func, inputs, state)
+            func.dispatch_record = CallbackDispatchRecord.from_callback(func, inputs, state, output, memoize)
+            func.expanded = func.dispatch_record.expanded
             return func
         return wrap_func
 
@@ -364,6 +706,7 @@ class DjangoDash:
                          'prevent_initial_call': prevent_initial_call}
 
         self._clientside_callback_sets.append(callback_set)
+        self.invalidate_instance_cache()
 
 
     def get_asset_url(self, asset_name):
@@ -448,6 +791,22 @@ class WrappedDash(Dash):
 
         self._return_embedded = False
 
+        self._layout_cache = {}
+
+    def with_replacements(self, replacements=None):
+        '''
+        Return a shallow copy of this instance that uses the supplied replacements.
+
+        The copy shares layout, callbacks and routes with this instance, so it is cheap to form,
+        and per-request values (replacements, embedding) can be set on it without affecting
+        other users of this instance.
+        '''
+        rd = copy.copy(self)
+        rd._replacements = replacements if replacements else dict()
+        rd._use_dash_layout = len(rd._replacements) < 1
+        rd._return_embedded = False
+        return rd
+
     def use_dash_dispatch(self):
         """Return True if underlying dash dispatching should be used.
 
@@ -466,29 +825,162 @@ class WrappedDash(Dash):
         '''
         return self._use_dash_layout
 
+    def set_layout_cache(self, layout_cache):
+        'Use the supplied dictionary to hold the serialized layout of this instance'
+        self._layout_cache = layout_cache
+
+    def _layout_overrides(self, initial_arguments):
+        'Return overrides formed from self._replacements updated with initial_arguments'
+        if not initial_arguments:
+            return self._replacements
+        overrides = dict(self._replacements)
+        overrides.update(initial_arguments)
+        return overrides
+
+    def _base_layout(self):
+        '''
+        Return the serialized base layout of this app, along with its mimetype.
+
+        The layout is only serialized once, unless it is formed by a function.
+        '''
+        base_layout = self._layout_cache.get('layout', None)
+        if base_layout is None:
+            base_response = self.locate_endpoint_function('dash-layout')()
+            base_layout = (base_response.data, base_response.mimetype)
+            if not self._layout_is_function:
+                self._layout_cache['layout'] = base_layout
+        return base_layout
+
+    def layout_hash(self):
+        'Return a hash of the serialized base layout, or None if the layout is formed by a function'
+        if self._layout_is_function:
+            return None
+        layout_hash = self._layout_cache.get('hash', None)
+        if layout_hash is None:
+            layout_hash = hashlib.sha1(self._base_layout()[0]).hexdigest()
+            self._layout_cache['hash'] = layout_hash
+        return layout_hash
+
+    def base_layout_tree(self):
+        'Return the base layout of this app as a tree of python dicts and lists, which must not be modified'
+        tree = self._layout_cache.get('tree', None)
+        if tree is None:
+            tree = serializer.loads(self._base_layout()[0])
+            if not self._layout_is_function:
+                self._layout_cache['tree'] = tree
+        return tree
+
+    def layout_response_data(self, initial_arguments=None, stream=False):
+        '''
+        Return the initial layout, with application state and any initial arguments applied, and its mimetype.
+
+        Replacements are applied to a parsed form of the base layout that is retained between requests, and
+        if there is nothing to replace then the serialized base layout is returned unchanged. If stream is
+        True then a layout with replacements is returned as an iterable of encoded pieces.
+        '''
+        if self._layout_is_function:
+            base_response = self.locate_endpoint_function('dash-layout')()
+            return self.augment_initial_layout(base_response, initial_arguments)
+
+        base_data, mimetype = self._base_layout()
+
+        overrides = self._layout_overrides(initial_arguments)
+        if not overrides:
+            return base_data, mimetype
+
+        reworked_data = self.replace_using_index(self.base_layout_tree(),
+                                                 self.base_layout_index(),
+                                                 overrides)
+
+        if stream:
+            return StreamedJson(reworked_data), mimetype
+
+        response_data = serializer.dumps(reworked_data)
+
+        return response_data, mimetype
+
+    def base_layout_index(self):
+        'Return an index of component identifiers to their locations within the base layout tree'
+        index = self._layout_cache.get('index', None)
+        if index is None:
+            index = {}
+            self.walk_tree_and_index(self.base_layout_tree(), (), index)
+            if not self._layout_is_function:
+                self._layout_cache['index'] = index
+        return index
+
+    def walk_tree_and_index(self, data, path, index):
+        'Walk tree of properties and record the path to each element that has an identifier'
+        if isinstance(data, dict):
+            ident = data.get('id', None)
+            if isinstance(ident, (str, dict)):
+                index.setdefault(wid2str(ident), []).append(path)
+            for key, value in data.items():
+                self.walk_tree_and_index(value, path + (key,), index)
+        elif isinstance(data, list):
+            for i, element in enumerate(data):
+                self.walk_tree_and_index(element, path + (i,), index)
+
+    @staticmethod
+    def replace_using_index(data, index, overrides):
+        '''
+        Apply overrides to the tree, using an index of identifiers to locations in the tree.
+
+        Only the elements being overridden, and their ancestors, are copied, so the supplied tree
+        is not altered. The result is the same as that of walk_tree_and_replace.
+        '''
+        targets = []
+        for ident, replacements in overrides.items():
+            for path in index.get(ident, []):
+                targets.append((path, replacements))
+
+        if not targets:
+            return data
+
+        # Apply outermost elements first, so that a replaced subtree is not then altered
+        targets.sort(key=lambda target: len(target[0]))
+
+        copied = {(): copy.copy(data)}
+        replaced = set()
+
+        for path, replacements in targets:
+            if any(path[:i] in replaced for i in range(len(path))):
+                continue
+
+            node = copied[()]
+            for i in range(1, len(path)+1):
+                prefix = path[:i]
+                child = copied.get(prefix, None)
+                if child is None:
+                    child = copy.copy(node[path[i-1]])
+                    node[path[i-1]] = child
+                    copied[prefix] = child
+                node = child
+
+            for key in list(node):
+                value = replacements.get(key, None)
+                if value is not None:
+                    node[key] = value
+                    replaced.add(path + (key,))
+
+        return copied[()]
+
     def augment_initial_layout(self, base_response, initial_arguments=None):
         'Add application state to initial values'
-        if self.use_dash_layout() and not initial_arguments and False:
+        if self.use_dash_layout() and not initial_arguments:
             return base_response.data, base_response.mimetype
 
         # Adjust the base layout response
-        baseDataInBytes = base_response.data
-        baseData = json.loads(baseDataInBytes.decode('utf-8'))
-
-        # Also add in any initial arguments
-        if not initial_arguments:
-            initial_arguments = {}
+        baseData = serializer.loads(base_response.data)
 
         # Define overrides as self._replacements updated with initial_arguments
-        overrides = dict(self._replacements)
-        overrides.update(initial_arguments)
+        overrides = self._layout_overrides(initial_arguments)
 
         # Walk tree. If at any point we have an element whose id
         # matches, then replace any named values at this level
         reworked_data = self.walk_tree_and_replace(baseData, overrides)
 
-        response_data = json.dumps(reworked_data,
-                                   cls=DjangoPlotlyJSONEncoder)
+        response_data = serializer.dumps(reworked_data)
 
         return response_data, base_response.mimetype
 
@@ -567,7 +1059,13 @@ class WrappedDash(Dash):
                            name)
         else:
             ep = self._base_pathname
-        return self._notflask.endpoints[ep]['view_func']
+        view_func = self._notflask.endpoints[ep]['view_func']
+
+        # Endpoints are registered as methods of the instance that formed them, so
+        # rebind them if this instance is a copy formed by with_replacements
+        if inspect.ismethod(view_func) and isinstance(view_func.__self__, WrappedDash) and view_func.__self__ is not self:
+            view_func = view_func.__func__.__get__(self)
+        return view_func
 
     # pylint: disable=no-member
     @Dash.layout.setter
@@ -630,27 +1128,28 @@ class WrappedDash(Dash):
                                            prevent_initial_call=prevent_initial_call)
 
     #pylint: disable=too-many-locals
-    def dispatch_with_args(self, body, argMap):
-        'Perform callback dispatching, with enhanced arguments and recording of response'
+    def _prepare_dispatch(self, body, argMap):
+        '''
+        Locate the callback for a request, and form its arguments, recording any state changes.
+
+        Returns the callback, its positional and keyword arguments, the stateful app if any, the
+        (id, property) pairs of the outputs and the memoization key and timeout, or None if the
+        callback should not be invoked.
+        '''
+        output = body['output']
+        callback_info = self.callback_map[output]
+        callback = callback_info["callback"]
+        record = dispatch_record_for(callback, callback_info)
+
         inputs = body.get('inputs', [])
-        input_values = inputs_to_dict(inputs)
         states = body.get('state', [])
-        output = body['output']
-        outputs_list = body.get('outputs') or split_callback_id(output)
-        changed_props = body.get('changedPropIds', [])
-        triggered_inputs = [{"prop_id": x, "value": input_values.get(x)} for x in changed_props]
-
-        callback_context_info = {
-            'inputs_list': inputs,
-            'inputs': input_values,
-            'states_list': states,
-            'states': inputs_to_dict(states),
-            'outputs_list': outputs_list,
-            'outputs': outputs_list,
-            'triggered': triggered_inputs,
-            }
-
-        callback_context = CallbackContext(**callback_context_info)
+
+        # Dash 1.11 introduces a set of outputs
+        outputs_list, state_outputs = record.outputs(output)
+        outputs_list = body.get('outputs') or outputs_list
+
+        callback_context = CallbackContext(inputs, states, outputs_list,
+                                           body.get('changedPropIds', []))
 
         # Overload dash global variable
         dash.callback_context = callback_context
@@ -659,22 +1158,17 @@ class WrappedDash(Dash):
         if len(argMap) > 0:
             argMap['callback_context'] = callback_context
 
-        single_case = not(output.startswith('..') and output.endswith('..'))
-        if single_case:
-            # single Output (not in a list)
-            outputs = [output]
-        else:
-            # multiple outputs in a list (the list could contain a single item)
-            outputs = output[2:-2].split('...')
-
-
-        da = argMap.get('dash_app', None)
-
-        callback_info = self.callback_map[output]
+        da = resolve_argument(argMap.get('dash_app', None))
 
         args = []
 
-        for c in inputs + states:
+        if da:
+            # Read the state of all components that might be updated in one go
+            da.prefetch_current_state_entries(
+                [ci['id'] for c in itertools.chain(inputs, states) for ci in (c if isinstance(c, list) else [c])] +
+                [output_id for output_id, _ in state_outputs])
+
+        for c in itertools.chain(inputs, states):
             if isinstance(c, list):  # ALL, ALLSMALLER
                 v = [ci.get("value") for ci in c]
                 if da:
@@ -687,52 +1181,75 @@ class WrappedDash(Dash):
 
             args.append(v)
 
-
-        # Dash 1.11 introduces a set of outputs
-        outputs_list = body.get('outputs') or split_callback_id(output)
         argMap['outputs_list'] = outputs_list
 
         # Special: intercept case of insufficient arguments
         # This happens when a property has been updated with a pipe component
         # TODO see if this can be attacked from the client end
 
-        if len(args) < len(callback_info['inputs']):
-            return 'EDGECASEEXIT'
+        if len(args) < record.n_inputs:
+            return None
 
-        callback = callback_info["callback"]
         # smart injection of parameters if .expanded is defined
-        if callback.expanded is not None:
-            parameters_to_inject = {*callback.expanded, 'outputs_list'}
-            res = callback(*args, **{k: v for k, v in argMap.items() if k in parameters_to_inject})
-        else:
-            res = callback(*args, **argMap)
+        return (callback, args, record.bind_kwargs(argMap), da, state_outputs,
+                record.memo_key(self._uid, body, argMap), record.memoize_timeout)
 
+    @staticmethod
+    def _record_outputs(res, da, state_outputs):
+        'Record the values of any outputs that are part of the state of a stateful app'
         if da:
-            class LazyJson:
-                """A class to allow delayed the evaluation of a dict (returned by `func`)
-                 till the first get(...) is called on the dict."""
-
-                def __init__(self, func):
-                    self._root_value = func
-
-                def get(self, item, default):
-                    if isinstance(self._root_value, Callable):
-                        self._root_value = self._root_value()
-                    return self._root_value.get(item, default)
-
-            # wraps the json parsing of the response into LazyJson to avoid unnecessary parsing
-            root_value = LazyJson(lambda: json.loads(res).get('response', {}))
-
-            for output_item in outputs:
-                if isinstance(output_item, str):
-                    output_id, output_property = output_item.split('.')
-                    if da.have_current_state_entry(output_id, output_property):
-                        value = root_value.get(output_id,{}).get(output_property, None)
-                        da.update_current_state(output_id, output_property, value)
-                else:
-                    # todo: implement saving of state for pattern matching ouputs
-                    raise NotImplementedError("Updating state for dict keys (pattern matching) is not yet implemented")
+            # wraps the json parsing of the response into _LazyJson to avoid unnecessary parsing
+            if isinstance(res, StreamedJson):
+                root_value = _LazyJson(lambda: serializer.loads(res.to_json()).get('response', {}))
+            else:
+                root_value = _LazyJson(lambda: serializer.loads(res).get('response', {}))
+
+            for output_id, output_property in state_outputs:
+                if da.have_current_state_entry(output_id, output_property):
+                    value = root_value.get(output_id,{}).get(output_property, None)
+                    da.update_current_state(output_id, output_property, value)
+
+        return res
+
+    def dispatch_with_args(self, body, argMap):
+        'Perform callback dispatching, with enhanced arguments and recording of response'
+        prepared = self._prepare_dispatch(body, argMap)
+        if prepared is None:
+            return 'EDGECASEEXIT'
+        callback, args, kwargs, da, state_outputs, memo_key, memo_timeout = prepared
+
+        res = memoized_callback_result(memo_key)
+        if res is None:
+            if inspect.iscoroutinefunction(callback):
+                res = async_to_sync(callback)(*args, **kwargs)
+            else:
+                res = callback(*args, **kwargs)
+            res = memoize_callback_result(memo_key, res, memo_timeout)
+
+        return self._record_outputs(res, da, state_outputs)
+
+    async def async_dispatch_with_args(self, body, argMap):
+        '''
+        Perform callback dispatching, with enhanced arguments and recording of response, from async code.
 
+        Coroutine callbacks are awaited directly. Other callbacks, and access to any state, run in a thread.
+        '''
+        prepared = await sync_to_async(self._prepare_dispatch)(body, argMap)
+        if prepared is None:
+            return 'EDGECASEEXIT'
+        callback, args, kwargs, da, state_outputs, memo_key, memo_timeout = prepared
+
+        res = await sync_to_async(memoized_callback_result)(memo_key) if memo_key else None
+        if res is None:
+            if inspect.iscoroutinefunction(callback):
+                res = await callback(*args, **kwargs)
+            else:
+                res = await sync_to_async(callback)(*args, **kwargs)
+            if memo_key:
+                res = await sync_to_async(memoize_callback_result)(memo_key, res, memo_timeout)
+
+        if da:
+            return await sync_to_async(self._record_outputs)(res, da, state_outputs)
         return res
 
     def slugified_id(self):
@@ -762,6 +1279,9 @@ class WrappedDash(Dash):
 
     def index(self, *args, **kwargs):  # pylint: disable=unused-argument
         scripts = self._generate_scripts_html()
+        if batch_updates():
+            # Load the shim that coalesces callback requests before the renderer
+            scripts = '<script src="%s"></script>\n%s' % (static_path(BATCH_UPDATES_SCRIPT), scripts)
         css = self._generate_css_dist_html()
         config = self._generate_config_html()
         metas = self._version_independent_generate_meta()
@@ -788,6 +1308,28 @@ class WrappedDash(Dash):
 
         return index
 
+    def _collect_and_register_resources(self, resources, *args, **kwargs): # pylint: disable=arguments-differ
+        srcs = super()._collect_and_register_resources(resources, *args, **kwargs)
+        if not direct_static_urls():
+            return srcs
+        # Refer to component suites by their static URLs, avoiding a redirect for each of them
+        return [self._direct_static_src(src) for src in srcs]
+
+    def _direct_static_src(self, src):
+        'Return the static URL for a component suite resource, or the supplied source if it is not one'
+        if isinstance(src, dict):
+            return dict(src, src=self._direct_static_src(src['src'])) if 'src' in src else src
+
+        prefix = "%s_dash-component-suites/" % self.config.requests_pathname_prefix
+        if not src.startswith(prefix):
+            return src
+
+        resource, _, query = src[len(prefix):].partition('?')
+        url = component_static_url(resource)
+        if query and '?' not in url:
+            url = "%s?%s" % (url, query)
+        return url
+
     def _version_independent_generate_meta(self):
         # Handle renaming of function - for older dash, call the older function if present
         if hasattr(self, '_generate_meta_html'):
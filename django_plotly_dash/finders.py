@@ -24,6 +24,7 @@ SOFTWARE.
 
 import os
 import importlib
+import importlib.util
 
 from collections import OrderedDict
 from pathlib import Path
@@ -37,7 +38,7 @@ from django.conf import settings
 from django.apps import apps
 
 from django_plotly_dash.dash_wrapper import all_apps
-from django_plotly_dash.util import full_asset_path
+from django_plotly_dash.util import full_asset_path, app_modules
 
 
 class DashComponentFinder(BaseFinder):
@@ -124,29 +125,53 @@ class DashComponentFinder(BaseFinder):
                     self.storages[component_name] = storage
                     self.components[path] = component_name
 
+        # Map from the parts of the mount point of each component to the component name and its
+        # position in the search order, so that only the prefixes of a path need to be looked up
+        self.prefixes = {
+            Path(path).parts: (self.locations.index(component_name), component_name)
+            for path, component_name in self.components.items()
+        }
+
+        # Contents of the directories seen so far, which do not change while running
+        self.directory_contents = {}
+
         super().__init__()
 
     def find(self, path, find_all=False, all=False):
         all = all or find_all
-        matches = []
-        for component_name in self.locations:
-            storage = self.storages[component_name]
-            location = storage.location  # dir on disc
+        parts = Path(path).parts
+        if ".." in parts:
+            return []
 
-            component_path = str(Path("dash/component/%s" % component_name))
+        candidates = sorted(
+            (self.prefixes[parts[:i]], i)
+            for i in range(1, len(parts))
+            if parts[:i] in self.prefixes
+        )
 
-            if (
-                len(path) > len(component_path)
-                and path[: len(component_path)] == component_path
-            ):
-                matched_path = os.path.join(location, path[len(component_path) + 1 :])
-                if os.path.exists(matched_path):
-                    if not all:
-                        return matched_path
-                    matches.append(matched_path)
+        matches = []
+        for (_, component_name), prefix_length in candidates:
+            location = self.storages[component_name].location  # dir on disc
+            matched_path = os.path.join(location, *parts[prefix_length:])
+            if self._exists(matched_path):
+                if not all:
+                    return matched_path
+                matches.append(matched_path)
 
         return matches
 
+    def _exists(self, path):
+        "Return True if the path exists, using the cached contents of its directory"
+        directory, name = os.path.split(path)
+        contents = self.directory_contents.get(directory, None)
+        if contents is None:
+            try:
+                contents = frozenset(os.listdir(directory))
+            except OSError:
+                contents = frozenset()
+            self.directory_contents[directory] = contents
+        return name in contents
+
     # pylint: disable=inconsistent-return-statements, no-self-use
     def find_location(self, path):
         "Return location, if it exists"
@@ -204,14 +229,6 @@ class DashAssetFinder(BaseFinder):
     # pylint: disable=unused-import, unused-variable, no-name-in-module, import-error, abstract-method
 
     def __init__(self):
-        # Ensure urls are loaded
-        root_urls = settings.ROOT_URLCONF
-        importlib.import_module(root_urls)
-
-        # Get all registered django dash apps
-
-        self.apps = all_apps()
-
         self.locations = []
         self.storages = OrderedDict()
 
@@ -220,10 +237,28 @@ class DashAssetFinder(BaseFinder):
             "*.pyc",
         ]
 
-        added_locations = {}
+        module_names = app_modules()
+        if module_names is not None:
+            # The modules defining apps are known, so neither they nor the urls need to be imported
+            self.apps = {}
+            self._add_module_locations(module_names)
+        else:
+            self._add_app_locations()
+
+        super().__init__()
+
+    def _add_app_locations(self):
+        "Add the assets folder of each registered app, having imported the urls so that all apps are registered"
+
+        # Ensure urls are loaded
+        root_urls = settings.ROOT_URLCONF
+        importlib.import_module(root_urls)
+
+        # Get all registered django dash apps
+
+        self.apps = all_apps()
 
         for app_slug, obj in self.apps.items():
-            caller_module = obj.caller_module
             location = obj.caller_module_location
             subdir = obj.assets_folder
 
@@ -238,7 +273,21 @@ class DashAssetFinder(BaseFinder):
                 self.locations.append(component_name)
                 self.storages[component_name] = storage
 
-        super().__init__()
+    def _add_module_locations(self, module_names):
+        "Add the assets folder of each module, located without importing the module"
+        for module_name in module_names:
+            spec = importlib.util.find_spec(module_name)
+            if spec is None or not spec.origin:
+                continue
+
+            path_directory = os.path.join(os.path.dirname(spec.origin), "assets")
+
+            if os.path.isdir(path_directory):
+                storage = FileSystemStorage(location=path_directory)
+                storage.prefix = full_asset_path(module_name, "")
+
+                self.locations.append(module_name)
+                self.storages[module_name] = storage
 
     # pylint: disable=redefined-builtin
     def find(self, path, all=False, **kwargs):
@@ -0,0 +1,152 @@
+"""
+Management command to collect the static files of dash components and apps
+
+Copyright (c) 2018 Gibbs Consulting and others - see CONTRIBUTIONS.md
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import hashlib
+import importlib
+import json
+import os
+import shutil
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.utils import get_files
+from django.core.management.base import BaseCommand, CommandError
+
+from django_plotly_dash.finders import DashComponentFinder, DashAppDirectoryFinder, DashAssetFinder
+
+
+MANIFEST_NAME = "django_plotly_dash_static.json"
+
+# Patterns ignored by default by the collectstatic command
+DEFAULT_IGNORE_PATTERNS = ["CVS", ".*", "*~"]
+
+
+def _package_version(component_name):
+    "Return the version of the package providing a component, or None if it has no version"
+    try:
+        module = importlib.import_module(component_name.split("/")[0])
+    except ImportError:
+        return None
+    return getattr(module, "__version__", None)
+
+
+def _copy_file(source, target):
+    "Copy a file, and its modification time, creating the target directory if needed"
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(source, target)
+
+
+class Command(BaseCommand):
+    "Copy the static files of dash components and apps into STATIC_ROOT, skipping unchanged sources"
+
+    help = ("Collect the static files of dash components and apps into STATIC_ROOT. Each source is fingerprinted, "
+            "and sources that are unchanged since the last run are skipped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--manifest", default=None,
+                            help="Location of the manifest of collected sources, by default within STATIC_ROOT")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Number of threads used to examine and copy files")
+        parser.add_argument("--force", action="store_true",
+                            help="Collect every source, whether or not it has changed")
+
+    def handle(self, *args, **options):
+        static_root = getattr(settings, "STATIC_ROOT", None)
+        if not static_root:
+            raise CommandError("The STATIC_ROOT setting is required to collect static files")
+
+        manifest_path = options["manifest"] or os.path.join(static_root, MANIFEST_NAME)
+        previous = self.read_manifest(manifest_path)
+
+        sources = self.sources()
+
+        manifest = {}
+        collected = set()
+        copied = skipped = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for key, storage, files, version in sources:
+                fingerprint = self.fingerprint(executor, storage, files, version)
+                entry = previous.get(key, None)
+                targets = [os.path.join(static_root, storage.prefix, path) for path in files]
+                collected.update(targets)
+
+                if not options["force"] and entry is not None and entry["fingerprint"] == fingerprint:
+                    skipped += 1
+                else:
+                    list(executor.map(_copy_file, [storage.path(path) for path in files], targets))
+                    copied += len(files)
+
+                manifest[key] = {"fingerprint": fingerprint, "prefix": storage.prefix, "files": files}
+
+        # Remove files that are no longer part of any source, including those of sources that have been dropped
+        for key, entry in previous.items():
+            prefix = manifest[key]["prefix"] if key in manifest else entry.get("prefix", None)
+            if prefix is None:
+                continue
+            for stale in entry["files"]:
+                stale_path = os.path.join(static_root, prefix, stale)
+                if stale_path not in collected and os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+        os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1)
+
+        self.stdout.write("%i files copied from %i sources, %i unchanged sources skipped" % (copied,
+                                                                                           len(sources) - skipped,
+                                                                                           skipped))
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        "Return the content of the manifest from a previous run, or an empty one if there is none"
+        try:
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def sources():
+        "Return the key, storage, files and package version of each source of static files"
+        ignore_patterns = list(DEFAULT_IGNORE_PATTERNS)
+
+        sources = []
+        for finder_class in [DashComponentFinder, DashAppDirectoryFinder, DashAssetFinder]:
+            finder = finder_class()
+            for location in finder.locations:
+                storage = finder.storages[location]
+                files = sorted(get_files(storage, ignore_patterns + finder.ignore_patterns))
+                version = _package_version(location) if finder_class is DashComponentFinder else None
+                sources.append(("%s:%s" % (finder_class.__name__, location), storage, files, version))
+        return sources
+
+    @staticmethod
+    def fingerprint(executor, storage, files, version):
+        "Return a fingerprint of a source, formed from the package version and the names and modification times of files"
+        mtimes = executor.map(lambda path: os.stat(storage.path(path)).st_mtime_ns, files)
+        names = hashlib.sha1("\n".join(files).encode("utf-8")).hexdigest()
+        return "%s:%s:%i" % (version, names, max(mtimes, default=0))
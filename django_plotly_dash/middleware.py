@@ -25,7 +25,9 @@ SOFTWARE.
 
 '''
 
-from .util import serve_locally, static_path
+import re
+
+from .util import serve_locally, static_path, external_redirection_prefixes
 
 #pylint: disable=too-few-public-methods
 
@@ -113,8 +115,46 @@ except Exception as e:
     pass
 
 
+def _trie_pattern(sources):
+    '''
+    Return a regular expression pattern that matches any of the byte string sources.
+
+    The pattern is formed from a trie of the sources, so that the regular expression engine only examines
+    the sources that share a prefix with the content at each position. Where one source is a prefix of
+    another, the longer source is matched.
+    '''
+    trie = {}
+    for source in sources:
+        node = trie
+        for byte in source:
+            node = node.setdefault(byte, {})
+        node[None] = {}
+
+    def node_pattern(node):
+        branches = [re.escape(bytes([byte])) + node_pattern(child)
+                    for byte, child in sorted((key, value) for key, value in node.items() if key is not None)]
+        if not branches:
+            return b""
+        if len(branches) == 1 and None not in node:
+            return branches[0]
+        alternation = b"(?:" + b"|".join(branches) + b")"
+        return alternation + b"?" if None in node else alternation
+
+    return node_pattern(trie)
+
+
 class ExternalRedirectionMiddleware:
-    'Middleware to force redirection in third-party content through rewriting'
+    '''
+    Middleware to force redirection in third-party content through rewriting
+
+    All of the substitutions are made in a single pass over the content of a response, and only
+    responses containing html or javascript are rewritten.
+    '''
+
+    rewritten_content_types = ("text/html",
+                               "text/javascript",
+                               "application/javascript",
+                               "application/x-javascript",)
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -126,27 +166,45 @@ class ExternalRedirectionMiddleware:
 
         self._encoding = "utf-8"
 
+        self.set_substitutions(substitutions)
+
+    def set_substitutions(self, substitutions):
+        'Set the pairs of source and target strings used to rewrite content'
         self.substitutions = [(self._encode(source),
                                self._encode(target)) for source, target in substitutions]
 
+        # Where a source appears more than once, the first in the list takes precedence
+        self._targets = {}
+        for source, target in self.substitutions:
+            self._targets.setdefault(source, target)
+
+        self._pattern = re.compile(_trie_pattern(self._targets)) if self._targets else None
+
     def __call__(self, request):
 
         response = self.get_response(request)
 
-        try:
-            content = response.content
-
-            for source, target in self.substitutions:
-                content = content.replace(source, target)
+        if self.should_rewrite(request, response):
+            response.content = self.rewrite(response.content)
 
-            response.content = content
+        return response
 
-        except AttributeError:
+    def should_rewrite(self, request, response):
+        'Return True if the content of the response might contain substitutions'
+        if self._pattern is None or response.streaming:
             # Not all files can contain substitutions, so ignore them
-            pass
+            return False
 
-        return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type not in self.rewritten_content_types:
+            return False
+
+        prefixes = external_redirection_prefixes()
+        return prefixes is None or request.path.startswith(tuple(prefixes))
+
+    def rewrite(self, content):
+        'Return the content with all of the substitutions made'
+        return self._pattern.sub(lambda match: self._targets[match.group(0)], content)
 
     def _encode(self, string):
         return string.encode(self._encoding)
-
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+# pylint: skip-file
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_plotly_dash', '0002_add_examples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashapp',
+            name='json_state',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
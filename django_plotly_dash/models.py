@@ -25,12 +25,17 @@ SOFTWARE.
 import json
 import logging
 
-from django.db import models
+from django.db import models, connections, router, NotSupportedError
+from django.db.models.fields.json import KeyTransform
 from django.contrib import admin
+from django.core.cache import caches
+from django.utils import timezone
 from django.utils.text import slugify
 from django.shortcuts import get_object_or_404
 
-from .dash_wrapper import get_local_stateless_by_name, get_local_stateless_list, wid2str, DjangoDash
+from .dash_wrapper import get_local_stateless_by_name, get_local_stateless_list, wid2str, DjangoDash, all_apps
+from .util import dash_app_cache_name, dash_app_cache_timeout, state_storage
+from . import serializer
 
 logger = logging.getLogger(__name__)
 
@@ -56,8 +61,19 @@ class StatelessApp(models.Model):
             exist_count = StatelessApp.objects.filter(slug__startswith=self.slug).count()
             if exist_count > 0:
                 self.slug = self.slug + str(exist_count+1)
+        invalidate_stateless_app(self.app_name)
         return super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs): # pylint: disable=arguments-differ
+        invalidate_stateless_app(self.app_name)
+        return super().delete(*args, **kwargs)
+
+    def __getstate__(self):
+        # The associated DjangoDash instance is never pickled, eg when caching
+        state = super().__getstate__()
+        state.pop('_stateless_dash_app_instance', None)
+        return state
+
     def as_dash_app(self) -> DjangoDash:
         '''
         Return a DjangoDash instance of the dash application
@@ -68,13 +84,61 @@ class StatelessApp(models.Model):
             setattr(self, '_stateless_dash_app_instance', dateless_dash_app)
         return dateless_dash_app
 
+# Stateless apps that have been resolved, keyed by name
+_stateless_app_cache = {}
+_stateless_app_cache_warmed = False
+
+
+def invalidate_stateless_app(name=None):
+    '''
+    Discard the resolved stateless app with the given name, or all of them if no name is supplied.
+
+    This should be called if an app provided through the stateless_loader setting changes.
+    '''
+    if name is None:
+        _stateless_app_cache.clear()
+    else:
+        _stateless_app_cache.pop(name, None)
+
+
+def warm_stateless_app_cache():
+    '''
+    Resolve all locally registered stateless apps that have an ORM entry, using a single query.
+    '''
+    global _stateless_app_cache_warmed # pylint: disable=global-statement
+    _stateless_app_cache_warmed = True
+
+    try:
+        names = get_local_stateless_list()
+        for dsa_app in StatelessApp.objects.filter(app_name__in=names): # pylint: disable=no-member
+            _stateless_app_cache[dsa_app.app_name] = dsa_app.as_dash_app()
+    except: # pylint: disable=bare-except
+        logger.warning("django-plotly-dash: Unable to resolve stateless apps in advance")
+
+
 def find_stateless_by_name(name):
     '''
     Find stateless app given its name
 
-    First search the Django ORM, and if not found then look the app up in a local registry.
+    Apps that have already been resolved are returned without any database access. Otherwise,
+    first search the Django ORM, and if not found then look the app up in a local registry.
     If the app does not have an ORM entry then a StatelessApp model instance is created.
     '''
+    if not _stateless_app_cache_warmed:
+        warm_stateless_app_cache()
+
+    dash_app = _stateless_app_cache.get(name, None)
+    # Ignore the cached app if another one has since been registered with the same name
+    if dash_app is not None and all_apps().get(name, dash_app) is dash_app:
+        return dash_app
+
+    dash_app = _find_stateless_by_name(name)
+    _stateless_app_cache[name] = dash_app
+    return dash_app
+
+
+def _find_stateless_by_name(name):
+    'Find stateless app given its name, using the ORM and then the local registry'
     try:
         dsa_app = StatelessApp.objects.get(app_name=name) # pylint: disable=no-member
         return dsa_app.as_dash_app()
@@ -90,7 +154,8 @@ def find_stateless_by_name(name):
 def check_stateless_loaded():
     for ua in get_local_stateless_list():
         try:
-            find_stateless_by_name(ua)
+            # Bypass the cache of resolved apps, so that any missing ORM entries are created
+            _stateless_app_cache[ua] = _find_stateless_by_name(ua)
         except:
             logger.warning("django-plotly-dash: Unable to create stateless instance: "+str(ua))
 
@@ -114,6 +179,60 @@ class StatelessAppAdmin(admin.ModelAdmin):
     actions = [check_registered,]
 
 
+# Version of the cached form of DashApp instances
+DASH_APP_CACHE_VERSION = 1
+
+
+def _dash_app_cache_key(slug):
+    return "dpd-dash-app-%s" % slug
+
+
+def _dash_app_cache():
+    'Return the Django cache used for DashApp instances'
+    return caches[dash_app_cache_name()]
+
+
+def _json_path(keys):
+    'Form a JSON path, as used by the sqlite and mysql json functions, for a sequence of object keys'
+    return '$' + ''.join('.' + json.dumps(key) for key in keys)
+
+
+def _json_key_supported(vendor, key):
+    'Return True if the database can address the key within a JSON document'
+    # sqlite silently ignores JSON paths that contain escaped quotes
+    return vendor != 'sqlite' or '"' not in key
+
+
+class JSONSet(models.Func):
+    '''
+    Database expression setting the value at a path within a JSON document.
+
+    Only the postgresql, sqlite and mysql backends are supported.
+    '''
+    vendors = ('postgresql', 'sqlite', 'mysql',)
+
+    def __init__(self, expression, path, value, **extra):
+        self.path = list(path)
+        self.value = serializer.dumps(value)
+        super().__init__(expression, output_field=models.JSONField(), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context): # pylint: disable=arguments-differ
+        raise NotSupportedError("JSONSet is not supported by the %s backend" % connection.vendor)
+
+    def _compile_with(self, template, path, compiler):
+        sql, params = compiler.compile(self.get_source_expressions()[0])
+        return template % sql, (*params, path, self.value)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self._compile_with("jsonb_set(%s, %%s::text[], %%s::jsonb)", self.path, compiler)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self._compile_with("json_set(%s, %%s, json(%%s))", _json_path(self.path), compiler)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._compile_with("JSON_SET(%s, %%s, JSON_EXTRACT(%%s, '$'))", _json_path(self.path), compiler)
+
+
 class DashApp(models.Model):
     '''
     An instance of this model represents a dash application and its internal state
@@ -124,8 +243,10 @@ class DashApp(models.Model):
                                      blank=True, null=False)
     slug = models.SlugField(max_length=110, unique=True, blank=True)
 
-    # If mandating postgresql then this could be a JSONField
+    # State stored as text, used unless json_state has been populated
     base_state = models.TextField(null=False, default="{}")
+    # State stored as a JSON document, if the state_storage setting is json
+    json_state = models.JSONField(null=True, blank=True)
 
     creation = models.DateTimeField(auto_now_add=True)
     update = models.DateTimeField(auto_now=True)
@@ -141,6 +262,48 @@ class DashApp(models.Model):
         if not self.slug or len(self.slug) < 2:
             self.slug = slugify(self.instance_name)
         super().save(*args, **kwargs)
+        self.cache_instance()
+
+    def delete(self, *args, **kwargs): # pylint: disable=arguments-differ
+        if dash_app_cache_timeout() is not None:
+            _dash_app_cache().delete(_dash_app_cache_key(self.slug), version=DASH_APP_CACHE_VERSION)
+        return super().delete(*args, **kwargs)
+
+    def __getstate__(self):
+        # Hydrated state is transient, and is cached separately if at all
+        state = super().__getstate__()
+        state.pop('_current_state_hydrated', None)
+        state.pop('_current_state_hydrated_changed', None)
+        state.pop('_current_state_dirty', None)
+        state.pop('_current_state_entries', None)
+        state.pop('_current_state_absent', None)
+        return state
+
+    def cache_instance(self, with_state=False):
+        '''
+        Store this instance, if DashApp instances are being cached.
+
+        If with_state is True, then the hydrated current state is also stored. This should only be
+        the case if the current state is the same as the persisted state.
+        '''
+        timeout = dash_app_cache_timeout()
+        if timeout is None:
+            return
+
+        state = getattr(self, '_current_state_hydrated', None) if with_state else None
+        _dash_app_cache().set(_dash_app_cache_key(self.slug), (self, state), timeout, version=DASH_APP_CACHE_VERSION)
+
+    @staticmethod
+    def _cached_instance(slug):
+        'Return a cached instance, with any cached state, or None if not present'
+        cached = _dash_app_cache().get(_dash_app_cache_key(slug), version=DASH_APP_CACHE_VERSION)
+        if cached is None:
+            return None
+        dash_app, state = cached
+        if state is not None:
+            setattr(dash_app, '_current_state_hydrated', state)
+            setattr(dash_app, '_current_state_hydrated_changed', False)
+        return dash_app
 
     def handle_current_state(self):
         '''
@@ -148,16 +311,127 @@ class DashApp(models.Model):
 
         If they are, then persist the current state in the database by saving the model instance.
         '''
-        if getattr(self, '_current_state_hydrated_changed', False) and self.save_on_change:
-            new_base_state = json.dumps(getattr(self, '_current_state_hydrated', {}))
-            if new_base_state != self.base_state:
-                self.base_state = new_base_state
-                self.save()
+        dirty = getattr(self, '_current_state_dirty', None)
+        if dirty and self.save_on_change:
+            self.persist_state_changes(dirty)
+            setattr(self, '_current_state_hydrated_changed', False)
+            setattr(self, '_current_state_dirty', set())
+            self.cache_instance(with_state=True)
+
+    def persist_state_changes(self, dirty):
+        '''
+        Persist changes to the current state, given the set of (id, property) pairs that have changed.
+
+        Only the state, and the time of update, are written to the database. If the state is stored
+        as JSON then, where the database supports it, only the changed values are written.
+        '''
+        if state_storage() != 'json':
+            self.base_state = serializer.dumps(self.current_state())
+            self.json_state = None
+            state_fields = ['base_state', 'json_state']
+        elif self.pk is not None and self._persist_partial_state(dirty):
+            return
+        else:
+            self.json_state = self.current_state()
+            state_fields = ['json_state']
+
+        if self.pk is None:
+            self.save()
+        else:
+            # Naming is already in place, so save directly
+            super().save(update_fields=state_fields + ['update'])
+
+    def _persist_partial_state(self, dirty):
+        'Update the changed values of an existing JSON state within the database, returning True if done'
+        vendor = connections[router.db_for_write(DashApp, instance=self)].vendor
+        if vendor not in JSONSet.vendors:
+            return False
+        if not all(_json_key_supported(vendor, wid) and _json_key_supported(vendor, key) for wid, key in dirty):
+            return False
+
+        expression = models.F('json_state')
+        for wid, key in sorted(dirty):
+            expression = JSONSet(expression, (wid, key), self._current_state_entry(wid)[key])
+
+        now = timezone.now()
+        if DashApp.objects.filter(pk=self.pk, json_state__isnull=False).update(json_state=expression, update=now) < 1: # pylint: disable=no-member
+            # The state has not yet been stored as JSON
+            return False
+        self.update = now
+        return True
+
+    def _partial_state_access(self):
+        'Return True if parts of the current state should be read without loading all of it'
+        return (state_storage() == 'json' and
+                self.pk is not None and
+                not getattr(self, '_current_state_hydrated', None) and
+                'json_state' in self.get_deferred_fields())
+
+    def prefetch_current_state_entries(self, wids):
+        '''
+        Read the current state of a number of components, using a single query.
+
+        This only reads from the database if the state is stored as JSON and has not already been loaded.
+        '''
+        if not self._partial_state_access():
+            return
+
+        vendor = connections[router.db_for_read(DashApp, instance=self)].vendor
+        entries = self._state_entries()
+        absent = self._absent_state_entries()
+        wanted = [wid for wid in dict.fromkeys(wid2str(wid) for wid in wids)
+                  if wid not in entries and wid not in absent and _json_key_supported(vendor, wid)]
+        if not wanted:
+            return
+
+        annotations = {"entry_%i" % i: KeyTransform(wid, 'json_state') for i, wid in enumerate(wanted)}
+        row = DashApp.objects.filter(pk=self.pk).annotate( # pylint: disable=no-member
+            has_json_state=models.ExpressionWrapper(models.Q(json_state__isnull=False),
+                                                    output_field=models.BooleanField()),
+            **annotations).values('has_json_state', *annotations).first()
+
+        if row is None or not row['has_json_state']:
+            # Not stored as JSON, so the whole state has to be loaded
+            self.current_state()
+            return
+
+        for i, wid in enumerate(wanted):
+            entry = row["entry_%i" % i]
+            if entry is None:
+                # Remember that the component has no state, without adding an entry for it
+                absent.add(wid)
+            else:
+                entries[wid] = entry
+
+    def _state_entries(self):
+        entries = getattr(self, '_current_state_entries', None)
+        if entries is None:
+            entries = {}
+            setattr(self, '_current_state_entries', entries)
+        return entries
+
+    def _absent_state_entries(self):
+        absent = getattr(self, '_current_state_absent', None)
+        if absent is None:
+            absent = set()
+            setattr(self, '_current_state_absent', absent)
+        return absent
+
+    def _current_state_entry(self, wid):
+        'Return the current state of a single component, reading only that part of the state if possible'
+        wid = wid2str(wid)
+        if self._partial_state_access():
+            self.prefetch_current_state_entries([wid])
+            entry = self._state_entries().get(wid, None)
+            if entry is not None:
+                return entry
+            if wid in self._absent_state_entries():
+                return {}
+        return self.current_state().get(wid, {})
 
     def have_current_state_entry(self, wid, key):
         'Return True if there is a cached current state for this app'
-        cscoll = self.current_state()
-        c_state = cscoll.get(wid2str(wid), {})
+        c_state = self._current_state_entry(wid)
         return key in c_state
 
     def update_current_state(self, wid, key, value):
@@ -166,13 +440,17 @@ class DashApp(models.Model):
 
         If the key does not represent an existing entry, then ignore it
         '''
-        cscoll = self.current_state()
-        c_state = cscoll.get(wid2str(wid), {})
+        c_state = self._current_state_entry(wid)
         if key in c_state:
             current_value = c_state.get(key, None)
             if current_value != value:
                 c_state[key] = value
                 setattr(self, '_current_state_hydrated_changed', True)
+                dirty = getattr(self, '_current_state_dirty', None)
+                if dirty is None:
+                    dirty = set()
+                    setattr(self, '_current_state_dirty', dirty)
+                dirty.add((wid2str(wid), key))
 
     def current_state(self):
         '''
@@ -183,29 +461,49 @@ class DashApp(models.Model):
         '''
         c_state = getattr(self, '_current_state_hydrated', None)
         if not c_state:
-            c_state = json.loads(self.base_state)
+            c_state = self.json_state
+            if c_state is None:
+                c_state = serializer.loads(self.base_state)
+            # Include any entries that have already been read, and possibly changed
+            c_state.update(getattr(self, '_current_state_entries', None) or {})
+            setattr(self, '_current_state_entries', None)
+            setattr(self, '_current_state_absent', None)
             setattr(self, '_current_state_hydrated', c_state)
             setattr(self, '_current_state_hydrated_changed', False)
+            setattr(self, '_current_state_dirty', set())
         return c_state
 
-    def as_dash_instance(self, cache_id=None):
-        'Return a dash application instance for this model instance'
+    def as_dash_instance(self, cache_id=None, with_state=True):
+        '''
+        Return a dash application instance for this model instance
+
+        The current state is only needed for the layout, so with_state can be False otherwise.
+        '''
         dash_app = self.stateless_app.as_dash_app() # pylint: disable=no-member
-        base = self.current_state()
+        base = self.current_state() if with_state else None
         return dash_app.do_form_dash_instance(replacements=base,
                                               specific_identifier=self.slug,
                                               cache_id=cache_id)
 
+    def dependencies_response_data(self, cache_id=None):
+        'Return the serialized callback dependencies of this instance, their mimetype and an ETag for them'
+        dash_app = self.stateless_app.as_dash_app() # pylint: disable=no-member
+        return dash_app.dependencies_response_data(specific_identifier=self.slug,
+                                                   cache_id=cache_id)
+
+    def layout_validators(self, initial_arguments=None):
+        'Return an ETag for the initial layout of this instance, and the time it was last modified'
+        dash_app = self.stateless_app.as_dash_app() # pylint: disable=no-member
+        return dash_app.layout_validators(initial_arguments, last_modified=self.update)
+
     def _get_base_state(self):
         '''
         Get the base state of the object, as defined by the app.layout code, as a python dict
         '''
         base_app_inst = self.stateless_app.as_dash_app().as_dash_instance() # pylint: disable=no-member
 
-        # Get base layout response, from a base object
-        base_resp = base_app_inst.locate_endpoint_function('dash-layout')()
-
-        base_obj = json.loads(base_resp.data.decode('utf-8'))
+        # Get base layout, from a base object
+        base_obj = base_app_inst.base_layout_tree()
 
         # Walk the base layout and find all values; insert into base state map
         obj = {}
@@ -217,18 +515,43 @@ class DashApp(models.Model):
         Add values from the underlying dash layout configuration
         '''
         obj = self._get_base_state()
-        self.base_state = json.dumps(obj)
+        self.base_state = serializer.dumps(obj)
+        self.json_state = obj if state_storage() == 'json' else None
 
     @staticmethod
-    def locate_item(ident, stateless=False, cache_id=None):
+    def locate_dash_app(ident, stateless=False):
+        '''Locate a dash application, given either the
+        slug of an instance or the name for a stateless app,
+        without forming a Dash instance for it'''
+        if stateless:
+            return find_stateless_by_name(ident)
+
+        queryset = DashApp.objects.select_related('stateless_app') # pylint: disable=no-member
+        if state_storage() == 'json':
+            # Parts of the state are read as needed
+            queryset = queryset.defer('base_state', 'json_state')
+
+        timeout = dash_app_cache_timeout()
+        if timeout is None:
+            return get_object_or_404(queryset, slug=ident)
+
+        dash_app = DashApp._cached_instance(ident)
+        if dash_app is None:
+            dash_app = get_object_or_404(queryset, slug=ident)
+            dash_app.current_state()
+            dash_app.cache_instance(with_state=True)
+        return dash_app
+
+    @staticmethod
+    def locate_item(ident, stateless=False, cache_id=None, with_state=True):
         '''Locate a dash application, given either the
         slug of an instance or the name for a stateless app'''
+        dash_app = DashApp.locate_dash_app(ident, stateless)
+
         if stateless:
-            dash_app = find_stateless_by_name(ident)
+            app = dash_app.as_dash_instance(cache_id=cache_id)
         else:
-            dash_app = get_object_or_404(DashApp, slug=ident)
-
-        app = dash_app.as_dash_instance(cache_id=cache_id)
+            app = dash_app.as_dash_instance(cache_id=cache_id, with_state=with_state)
         return dash_app, app
 
 class DashAppAdmin(admin.ModelAdmin):
@@ -247,6 +570,7 @@ class DashAppAdmin(admin.ModelAdmin):
         for dash_app in queryset:
             nda = DashApp(stateless_app=dash_app.stateless_app,
                           base_state=dash_app.base_state,
+                          json_state=dash_app.json_state,
                           save_on_change=dash_app.save_on_change)
             nda.save()
 
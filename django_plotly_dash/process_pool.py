@@ -0,0 +1,124 @@
+'''
+Process pool for running CPU-heavy callbacks
+
+Callbacks registered with use_process_pool=True are run in a pool of worker processes, so that
+they do not hold the GIL of the process handling requests.
+
+Copyright (c) 2018 Gibbs Consulting and others - see CONTRIBUTIONS.md
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from .util import process_pool_size, process_pool_timeout
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _initialise_worker():
+    'Prepare a worker process, which is started afresh rather than forked'
+    import django
+    django.setup()
+
+
+def get_process_pool():
+    'Return the process pool, creating it if needed'
+    global _process_pool # pylint: disable=global-statement
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Workers are spawned, so that they do not share database connections and other state with this process
+            _process_pool = ProcessPoolExecutor(max_workers=process_pool_size(),
+                                                mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_initialise_worker)
+        return _process_pool
+
+
+def shutdown_process_pool(wait=True):
+    'Shut down the process pool, if it exists. A new one is created when next needed.'
+    global _process_pool # pylint: disable=global-statement
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=wait)
+            _process_pool = None
+
+
+def _picklable(value):
+    try:
+        pickle.dumps(value)
+    except Exception: # pylint: disable=broad-except
+        return False
+    return True
+
+
+def picklable_kwargs(kwargs):
+    '''
+    Reduce the extra arguments of a callback to values that can be sent to a worker process.
+
+    The request is not sent, and the session state is sent as a copy so that changes made to it are
+    not persisted. Any other value that cannot be pickled, such as a stateless app, is replaced with None.
+    '''
+    reduced = {}
+    for key, value in kwargs.items():
+        if key == 'request':
+            value = None
+        elif key == 'session_state' and value is not None:
+            value = dict(value)
+        elif not _picklable(value):
+            value = None
+        reduced[key] = value
+    return reduced
+
+
+def _retire_process_pool(pool):
+    '''
+    Stop using a pool, if it is still the current one, so that a new one is created when next needed.
+
+    Work already submitted to the pool is allowed to finish, after which its worker processes exit.
+    '''
+    global _process_pool # pylint: disable=global-statement
+    with _process_pool_lock:
+        if _process_pool is not pool:
+            return
+        _process_pool = None
+    pool.shutdown(wait=False)
+
+
+def run_in_process_pool(func, *args):
+    '''
+    Run func(*args) in the process pool and return its result.
+
+    A concurrent.futures.TimeoutError is raised if the result is not available within the timeout
+    given by the process_pool_timeout setting. A worker process cannot be interrupted, so if the
+    callback has already started then the pool is retired and a new one used for later callbacks,
+    rather than leaving the worker occupied for them.
+    '''
+    pool = get_process_pool()
+    future = pool.submit(func, *args)
+    try:
+        return future.result(timeout=process_pool_timeout())
+    except FutureTimeoutError:
+        if not future.cancel():
+            _retire_process_pool(pool)
+        raise
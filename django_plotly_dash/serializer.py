@@ -0,0 +1,51 @@
+'''
+Serialization to and from JSON
+
+All JSON encoding and decoding within django-plotly-dash goes through this module. The orjson
+package is used if it is available, unless a different engine is selected with the json_engine setting.
+
+Copyright (c) 2018 Gibbs Consulting and others - see CONTRIBUTIONS.md
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import json
+
+from _plotly_utils.optional_imports import get_module
+
+from ._patches import DjangoPlotlyJSONEncoder, orjson_dumps, selected_engine, with_typed_arrays
+
+
+def dumps(obj):
+    'Return the JSON representation of obj as a compact string'
+    obj = with_typed_arrays(obj)
+    if selected_engine() == "orjson":
+        return orjson_dumps(obj).decode("utf-8")
+    return json.dumps(obj, cls=DjangoPlotlyJSONEncoder, separators=(",", ":"))
+
+
+def loads(data):
+    'Return the value represented by the JSON content of data, which can be a str or bytes'
+    if selected_engine() == "orjson":
+        if isinstance(data, str) and type(data) is not str:  # pylint: disable=unidiomatic-typecheck
+            # orjson only accepts str itself, and not subclasses such as SafeString
+            data = data.encode("utf-8")
+        return get_module("orjson", should_load=True).loads(data)
+    return json.loads(data)
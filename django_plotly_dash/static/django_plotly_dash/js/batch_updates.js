@@ -0,0 +1,76 @@
+/*
+ * Coalesce the callback requests made by the Dash renderer.
+ *
+ * Requests made to _dash-update-component within a short interval are sent together, as a
+ * single request to _dash-update-components, and the individual responses are then returned
+ * to the renderer. If the batched request fails, the requests are sent individually instead.
+ */
+(function () {
+    "use strict";
+
+    var UPDATE_SUFFIX = "_dash-update-component";
+    var BATCH_DELAY_MS = 5;
+
+    if (typeof window === "undefined" || typeof window.fetch !== "function" || window.dpdBatchUpdates) {
+        return;
+    }
+    window.dpdBatchUpdates = true;
+
+    var originalFetch = window.fetch.bind(window);
+    var pending = {};
+
+    function sendIndividually(queue) {
+        queue.forEach(function (entry) {
+            originalFetch(entry.input, entry.init).then(entry.resolve, entry.reject);
+        });
+    }
+
+    function flush(batchUrl) {
+        var queue = pending[batchUrl];
+        delete pending[batchUrl];
+
+        if (queue.length === 1) {
+            sendIndividually(queue);
+            return;
+        }
+
+        var init = queue[0].init;
+        originalFetch(batchUrl, {
+            method: "POST",
+            headers: init.headers,
+            credentials: init.credentials,
+            body: "[" + queue.map(function (entry) { return entry.init.body; }).join(",") + "]"
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error("Batched update failed with status " + response.status);
+            }
+            return response.json();
+        }).then(function (results) {
+            results.forEach(function (result, i) {
+                var body = result.content === null ? null : JSON.stringify(result.content);
+                queue[i].resolve(new Response(body, {
+                    status: result.status,
+                    headers: {"Content-Type": "application/json"}
+                }));
+            });
+        }).catch(function () {
+            sendIndividually(queue);
+        });
+    }
+
+    window.fetch = function (input, init) {
+        var url = typeof input === "string" ? input : input.url;
+        if (init && init.method === "POST" && typeof init.body === "string" &&
+            url.slice(-UPDATE_SUFFIX.length) === UPDATE_SUFFIX) {
+            var batchUrl = url + "s";
+            return new Promise(function (resolve, reject) {
+                if (!pending[batchUrl]) {
+                    pending[batchUrl] = [];
+                    setTimeout(function () { flush(batchUrl); }, BATCH_DELAY_MS);
+                }
+                pending[batchUrl].push({input: input, init: init, resolve: resolve, reject: reject});
+            });
+        }
+        return originalFetch(input, init);
+    };
+}());
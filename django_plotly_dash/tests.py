@@ -141,13 +141,13 @@ def test_dash_stateful_app_client_contract(client):
 
     # initialise layout with app state
     layout, mimetype = dash_instance.augment_initial_layout(resp, {})
-    assert '"n_clicks": 100' in layout
+    assert '"n_clicks":100' in layout
 
     # initialise layout with initial arguments
     layout, mimetype = dash_instance.augment_initial_layout(resp, {
         '{"_id":"inp-2","_type":"btn5"}': {"n_clicks": 200}})
-    assert '"n_clicks": 100' not in layout
-    assert '"n_clicks": 200' in layout
+    assert '"n_clicks":100' not in layout
+    assert '"n_clicks":200' in layout
 
     ########### test contract between client and app by replaying interactions recorded in tests_dash_contract.json
     # get update component route
@@ -629,6 +629,49 @@ def test_middleware_artifacts():
     assert cc._encode("fred") == b'fred'
 
 
+
+def test_external_redirection_middleware(settings):
+    'Check the rewriting of responses, and compare it with one replacement per substitution'
+
+    from django.http import HttpResponse, StreamingHttpResponse
+    from django.test import RequestFactory
+    from django_plotly_dash.middleware import ExternalRedirectionMiddleware
+
+    substitutions = [("https://cdn.example.com/lib-%i.min.js" % i, "/static/lib-%i.min.js" % i) for i in range(20)]
+    substitutions += [('integrity="sha384-%i"' % i, '') for i in range(10)]
+
+    def previous_rewrite(content):
+        for source, target in middleware.substitutions:
+            content = content.replace(source, target)
+        return content
+
+    responses = {}
+    middleware = ExternalRedirectionMiddleware(lambda request: responses[request.path])
+    middleware.set_substitutions(substitutions)
+
+    page = "".join('<script src="https://cdn.example.com/lib-%i.min.js" integrity="sha384-%i"></script>' % (i, i)
+                   for i in range(10)).encode("utf-8")
+    responses['/page'] = HttpResponse(page)
+    responses['/data'] = HttpResponse(page, content_type="application/octet-stream")
+    responses['/stream'] = StreamingHttpResponse([page])
+
+    factory = RequestFactory()
+    assert middleware(factory.get('/page')).content == previous_rewrite(page)
+    assert b'cdn.example.com' not in middleware(factory.get('/page')).content
+    assert middleware(factory.get('/data')).content == page
+    assert b"".join(middleware(factory.get('/stream')).streaming_content) == page
+
+    settings.PLOTLY_DASH = {'external_redirection_prefixes': ['/django_plotly_dash/']}
+    responses['/page'] = HttpResponse(page)
+    assert middleware(factory.get('/page')).content == page
+
+    # Pages containing the substituted links along with other content
+    filler = b"<div class='row'><span>Some content of the page</span></div>\n" * 1000
+    for size in [10**3, 10**5, 10**6]:
+        body = ((page + filler) * (size // len(page + filler) + 1))[:size]
+        assert middleware.rewrite(body) == previous_rewrite(body)
+
+
 def test_finders():
     'Import and vaguely exercise staticfiles finders'
 
@@ -642,6 +685,22 @@ def test_finders():
     assert dadf is not None
     assert daf is not None
 
+    import os
+    import dash
+    dash_root = os.path.dirname(dash.__file__)
+
+    # Nested components are searched in order, and negative results are also cached
+    found = dcf.find("dash/component/dash/dash-renderer/build/dash_renderer.min.js", find_all=True)
+    assert found == [os.path.join(dash_root, "dash-renderer", "build", "dash_renderer.min.js"),
+                     os.path.join(dash_root, "dash-renderer", "build", "dash_renderer.min.js")]
+    assert dcf.find("dash/component/dash/dcc/dash_core_components.js") == os.path.join(dash_root, "dcc",
+                                                                                   "dash_core_components.js")
+    assert dcf.find("dash/component/dash/dcc/no_such_file.js") == []
+    assert dcf.find("dash/component/dash/dcc/missing/no_such_file.js") == []
+    assert dcf.find("dash/component/dash/dcc/../__init__.py") == []
+    assert dcf.find("dash/component/unknown/file.js") == []
+    assert os.path.join(dash_root, "dcc", "missing") in dcf.directory_contents
+
 
 @pytest.mark.django_db
 def test_app_loading(client):
@@ -721,3 +780,1074 @@ def test_callback_decorator():
         return
 
     assert DjangoDash.get_expanded_arguments(callback_kwargs, inputs, states) == None
+
+
+def test_dash_instance_cache(settings):
+    'Check that dash instances are reused across requests and invalidated when the app changes'
+
+    from dash import html
+
+    ddash = DjangoDash(name="InstanceCacheApp")
+    ddash.layout = html.Div([html.Div(id="one", children="First")])
+
+    first = ddash.as_dash_instance()
+    second = ddash.do_form_dash_instance(replacements={"one": {"children": "Second"}})
+
+    # Copies of a single shared instance, with per-request replacements
+    assert first is not second
+    assert first.callback_map is second.callback_map
+    assert first.use_dash_layout()
+    assert not second.use_dash_layout()
+
+    # Endpoints are bound to the copy, not the shared instance
+    layout_func = second.locate_endpoint_function('dash-layout')
+    assert layout_func.__self__ is second
+
+    # Changing the app discards any cached instances
+    ddash.layout = html.Div([html.Div(id="two", children="Third")])
+    third = ddash.as_dash_instance()
+    assert third.callback_map is not first.callback_map
+    assert b"Third" in third.locate_endpoint_function('dash-layout')().data
+
+    @ddash.callback(Output("two", "children"), Input("one", "children"))
+    def update(value):
+        return value
+    assert "two.children" in ddash.as_dash_instance().callback_map
+
+    # A zero-sized cache forms a new instance every time
+    settings.PLOTLY_DASH = {'instance_cache_size': 0}
+    ddash.invalidate_instance_cache()
+    assert ddash.as_dash_instance().callback_map is not ddash.as_dash_instance().callback_map
+
+
+def test_dispatch_record_preparation():
+    'Check that dispatch records prepare callbacks in the same way as the previous uncompiled approach'
+
+    from dash._utils import split_callback_id, inputs_to_dict
+    from django_plotly_dash.dash_wrapper import CallbackContext, dispatch_record_for
+
+    ddash = DjangoDash(name="DispatchRecordPreparation")
+    fill_in_test_app(ddash, write=False)
+    app = ddash.as_dash_instance()
+
+    scenarios = [scenario["body"] for scenario in json.load(dash_contract_data.open("r"))]
+
+    def previous_preparation(body, arg_map):
+        inputs = body.get('inputs', [])
+        input_values = inputs_to_dict(inputs)
+        states = body.get('state', [])
+        output = body['output']
+        outputs_list = body.get('outputs') or split_callback_id(output)
+        triggered = [{"prop_id": x, "value": input_values.get(x)} for x in body.get('changedPropIds', [])]
+        context = dict(inputs_list=inputs, inputs=input_values, states_list=states,
+                       states=inputs_to_dict(states), outputs_list=outputs_list,
+                       outputs=outputs_list, triggered=triggered)
+        arg_map['callback_context'] = context
+        single_case = not(output.startswith('..') and output.endswith('..'))
+        outputs = [output] if single_case else output[2:-2].split('...')
+        outputs = [o.split('.') for o in outputs]
+        arg_map['outputs_list'] = body.get('outputs') or split_callback_id(output)
+        callback = app.callback_map[output]["callback"]
+        if callback.expanded is not None:
+            parameters_to_inject = {*callback.expanded, 'outputs_list'}
+            return outputs, {k: v for k, v in arg_map.items() if k in parameters_to_inject}
+        return outputs, arg_map
+
+    def record_preparation(body, arg_map):
+        output = body['output']
+        callback_info = app.callback_map[output]
+        record = dispatch_record_for(callback_info["callback"], callback_info)
+        outputs_list, state_outputs = record.outputs(output)
+        outputs_list = body.get('outputs') or outputs_list
+        arg_map['callback_context'] = CallbackContext(body.get('inputs', []), body.get('state', []),
+                                                      outputs_list, body.get('changedPropIds', []))
+        arg_map['outputs_list'] = outputs_list
+        return state_outputs, record.bind_kwargs(arg_map)
+
+    for body in scenarios:
+        previous_outputs, previous_kwargs = previous_preparation(body, {'dash_app_id': 'x'})
+        record_outputs, record_kwargs = record_preparation(body, {'dash_app_id': 'x'})
+        assert [tuple(o) for o in previous_outputs] == record_outputs
+        assert set(previous_kwargs) == set(record_kwargs)
+
+    # Each callback is compiled into a record once, rather than for each request
+    for body in scenarios:
+        callback_info = app.callback_map[body['output']]
+        record = dispatch_record_for(callback_info["callback"], callback_info)
+        assert dispatch_record_for(callback_info["callback"], callback_info) is record
+        assert record.outputs(body['output']) is record.outputs(body['output'])
+
+
+def test_layout_pipeline():
+    'Check the serving of layouts with and without replacement values'
+
+    from dash import html
+
+    ddash = DjangoDash(name="LayoutPipelineApp")
+    ddash.layout = html.Div([html.Div(id="one", children="First"),
+                             html.Div(id="two", children="Second")])
+
+    app = ddash.as_dash_instance()
+    base_data, mimetype = app.layout_response_data()
+    assert mimetype == "application/json"
+
+    # Without overrides, the cached serialized layout is returned unchanged
+    assert app.layout_response_data()[0] is base_data
+    assert ddash.as_dash_instance().layout_response_data()[0] is base_data
+    assert app.layout_response_data({})[0] is base_data
+
+    # Overrides are applied to the same layout
+    replaced = ddash.do_form_dash_instance(replacements={"one": {"children": "Replaced"}})
+    data, _ = replaced.layout_response_data({"two": {"children": "Initial"}})
+    layout = json.loads(data)
+    assert layout['props']['children'][0]['props']['children'] == "Replaced"
+    assert layout['props']['children'][1]['props']['children'] == "Initial"
+
+    base_response = replaced.locate_endpoint_function('dash-layout')()
+    assert json.loads(replaced.augment_initial_layout(base_response, {"two": {"children": "Initial"}})[0]) == layout
+
+    # Base layout is not modified by replacement
+    assert json.loads(base_data) == replaced.base_layout_tree()
+    assert "Replaced" not in base_data.decode('utf-8')
+
+    # Changing the layout discards the cached form
+    ddash.layout = html.Div(id="three", children="Third")
+    assert b"Third" in ddash.as_dash_instance().layout_response_data()[0]
+
+    # Layouts formed by a function are not cached
+    counter = []
+    def layout_function():
+        counter.append(1)
+        return html.Div(id="four", children="Call %i" % len(counter))
+    ddash.layout = layout_function
+    first_call = ddash.as_dash_instance().layout_response_data()[0]
+    assert first_call != ddash.as_dash_instance().layout_response_data()[0]
+
+
+def test_layout_index_replacement():
+    'Check that replacement using an index of the layout matches a walk of the whole tree'
+
+    from dash import html
+
+    ddash = DjangoDash(name="LayoutIndexApp")
+    fill_in_test_app(ddash, write=False)
+    app = ddash.as_dash_instance()
+
+    tree = app.base_layout_tree()
+    index = app.base_layout_index()
+    original = json.dumps(tree)
+
+    overrides = {'inp1': {'n_clicks': 100},
+                 'out1b': {'href': 'http://www.example.com/other', 'not_present': 1},
+                 '{"_id":"inp-2","_type":"btn5"}': {'n_clicks': 200, 'n_clicks_timestamp': None},
+                 'not-in-layout': {'children': 'Missing'},
+                }
+
+    assert app.replace_using_index(tree, index, overrides) == app.walk_tree_and_replace(tree, overrides)
+    assert app.replace_using_index(tree, index, {}) is tree
+    assert json.dumps(tree) == original
+
+    # Elements within a replaced subtree are not altered
+    ddash.layout = html.Div(id="outer", children=[html.Div(id="inner", children="Inner")])
+    app = ddash.as_dash_instance()
+    tree = app.base_layout_tree()
+    overrides = {'outer': {'children': 'Outer'},
+                 'inner': {'children': 'Changed'}}
+    result = app.replace_using_index(tree, app.base_layout_index(), overrides)
+    assert result == app.walk_tree_and_replace(tree, overrides)
+    assert result['props']['children'] == 'Outer'
+
+
+@pytest.mark.django_db
+def test_dependencies_caching(client):
+    'Check the caching of dependencies and their use with conditional requests'
+
+    from django.urls import reverse
+
+    etags = []
+    for prefix, arg_map in [('app-', {'ident':'SimpleExample'}),
+                            ('', {'ident':'simpleexample-1'}),]:
+        url = reverse('the_django_plotly_dash:%sdependencies' % prefix, kwargs=arg_map)
+
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert etag
+        etags.append(etag)
+
+        dependencies = json.loads(response.content)
+        assert 'output-size.children' in [dependency['output'] for dependency in dependencies]
+
+        with patch('django_plotly_dash.dash_wrapper.WrappedDash.dependencies') as mock:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304
+            assert not response.content
+
+            response = client.get(url, HTTP_IF_NONE_MATCH='"something-else"')
+            assert response.status_code == 200
+            assert response['ETag'] == etag
+            assert json.loads(response.content) == dependencies
+
+        mock.assert_not_called()
+
+    # The dependencies are held once for an app, rather than for each of its instances
+    assert etags[0] == etags[1]
+    assert get_local_stateless_by_name('SimpleExample')._dependencies_entry[2] == etags[0]
+
+
+@pytest.mark.django_db
+def test_stateless_app_cache(django_assert_num_queries):
+    'Check that resolved stateless apps are reused without database access'
+
+    from django_plotly_dash.models import StatelessApp, invalidate_stateless_app
+
+    ddash = DjangoDash(name="StatelessCacheApp")
+
+    assert find_stateless_by_name("StatelessCacheApp") is ddash
+    assert StatelessApp.objects.filter(app_name="StatelessCacheApp").exists()
+
+    with django_assert_num_queries(0):
+        assert find_stateless_by_name("StatelessCacheApp") is ddash
+
+    # A newly registered app with the same name replaces the cached one
+    ddash2 = DjangoDash(name="StatelessCacheApp")
+    assert find_stateless_by_name("StatelessCacheApp") is ddash2
+
+    # Explicit invalidation causes the app to be resolved again
+    invalidate_stateless_app("StatelessCacheApp")
+    with django_assert_num_queries(1):
+        assert find_stateless_by_name("StatelessCacheApp") is ddash2
+
+    invalidate_stateless_app()
+    assert find_stateless_by_name("StatelessCacheApp") is ddash2
+
+
+@pytest.mark.django_db
+def test_dash_app_caching(settings, django_assert_num_queries):
+    'Check the optional caching of DashApp instances and their state'
+
+    from django.core.cache import caches
+    from django_plotly_dash.models import StatelessApp
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                       'dash_apps': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                     'LOCATION': 'test_dash_app_caching'}}
+    settings.PLOTLY_DASH = {'cache_timeout_dash_apps': 60, 'dash_app_cache': 'dash_apps'}
+    caches['dash_apps'].clear()
+
+    ddash = DjangoDash(name="CachedDashApp")
+    fill_in_test_app(ddash, write=False)
+
+    stateless_a = StatelessApp(app_name="CachedDashApp")
+    stateless_a.save()
+    stateful_a = DashApp(stateless_app=stateless_a,
+                         instance_name="Cached instance",
+                         slug="cached-instance", save_on_change=True)
+    stateful_a.populate_values()
+    stateful_a.save()
+
+    # Saving stores the instance, so no queries are needed to locate it
+    with django_assert_num_queries(0):
+        located = DashApp.locate_dash_app("cached-instance")
+        assert located.pk == stateful_a.pk
+        assert located.stateless_app.as_dash_app() is ddash
+        assert located.current_state()['inp1']['n_clicks'] == 0
+
+    # Changes to the state are written through to the cache
+    located.update_current_state("inp1", "n_clicks", 10)
+    located.handle_current_state()
+
+    with django_assert_num_queries(0):
+        assert DashApp.locate_dash_app("cached-instance").current_state()['inp1']['n_clicks'] == 10
+    assert DashApp.objects.get(slug="cached-instance").current_state()['inp1']['n_clicks'] == 10
+
+    # State changes that are not persisted are not cached
+    located.save_on_change = False
+    located.update_current_state("inp1", "n_clicks", 20)
+    located.handle_current_state()
+    assert DashApp.locate_dash_app("cached-instance").current_state()['inp1']['n_clicks'] == 10
+
+    # Deletion removes the cached instance, and a single query is used when not cached
+    located.delete()
+    stateful_b = DashApp(stateless_app=stateless_a, instance_name="Other instance", slug="other-instance")
+    stateful_b.save()
+    settings.PLOTLY_DASH = {}
+    with django_assert_num_queries(1):
+        assert DashApp.locate_dash_app("other-instance").stateless_app.as_dash_app() is ddash
+    from django.http import Http404
+    settings.PLOTLY_DASH = {'cache_timeout_dash_apps': 60, 'dash_app_cache': 'dash_apps'}
+    with pytest.raises(Http404):
+        DashApp.locate_dash_app("cached-instance")
+    caches['dash_apps'].clear()
+
+
+def test_dash_app_cache_check(settings):
+    'Check that caching DashApp instances in a cache local to each process is rejected'
+
+    from django_plotly_dash.checks import check_dash_app_cache
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                       'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    settings.PLOTLY_DASH = {}
+    assert check_dash_app_cache() == []
+
+    settings.PLOTLY_DASH = {'cache_timeout_dash_apps': 60}
+    assert [error.id for error in check_dash_app_cache()] == ['django_plotly_dash.E001']
+
+    settings.PLOTLY_DASH = {'cache_timeout_dash_apps': 60, 'dash_app_cache': 'shared'}
+    assert check_dash_app_cache() == []
+
+
+@pytest.mark.django_db
+def test_state_change_persistence():
+    'Check that only changed state is tracked, and that persisting it only updates the state'
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django_plotly_dash.models import StatelessApp
+
+    ddash = DjangoDash(name="StatePersistenceApp")
+    fill_in_test_app(ddash, write=False)
+
+    stateless_a = StatelessApp(app_name="StatePersistenceApp")
+    stateless_a.save()
+    stateful_a = DashApp(stateless_app=stateless_a, instance_name="Persisted",
+                         slug="persisted", save_on_change=True)
+    stateful_a.populate_values()
+    stateful_a.save()
+
+    stateful_a = DashApp.objects.get(slug="persisted")
+
+    # Unchanged or untracked values do not cause any writes
+    stateful_a.update_current_state("inp1", "n_clicks", 0)
+    stateful_a.update_current_state("not-present", "n_clicks", 1)
+    with CaptureQueriesContext(connection) as queries:
+        stateful_a.handle_current_state()
+    assert len(queries) == 0
+
+    stateful_a.update_current_state("inp1", "n_clicks", 5)
+    stateful_a.update_current_state({"_type": "btn3", "_id": "inp-0"}, "n_clicks", 6)
+    assert stateful_a._current_state_dirty == {("inp1", "n_clicks"),
+                                               ('{"_id":"inp-0","_type":"btn3"}', "n_clicks")}
+
+    with CaptureQueriesContext(connection) as queries:
+        stateful_a.handle_current_state()
+    updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+    assert len(updates) == 1
+    assert 'instance_name' not in updates[0]
+    assert 'base_state' in updates[0]
+    assert not stateful_a._current_state_dirty
+
+    reloaded = DashApp.objects.get(slug="persisted").current_state()
+    assert reloaded['inp1']['n_clicks'] == 5
+    assert reloaded['{"_id":"inp-0","_type":"btn3"}']['n_clicks'] == 6
+
+
+@pytest.mark.django_db
+def test_json_state_storage(settings):
+    'Check storing state as JSON, including reading and updating parts of it'
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django_plotly_dash.models import StatelessApp
+
+    ddash = DjangoDash(name="JsonStateApp")
+    fill_in_test_app(ddash, write=False)
+
+    stateless_a = StatelessApp(app_name="JsonStateApp")
+    stateless_a.save()
+
+    # An instance whose state is stored as text is converted when next persisted
+    stateful_a = DashApp(stateless_app=stateless_a, instance_name="JsonState",
+                         slug="json-state", save_on_change=True)
+    stateful_a.populate_values()
+    stateful_a.save()
+    assert stateful_a.json_state is None
+
+    settings.PLOTLY_DASH = {'state_storage': 'json'}
+
+    stateful_a = DashApp.locate_dash_app("json-state")
+    stateful_a.update_current_state("inp1", "n_clicks", 3)
+    stateful_a.handle_current_state()
+    assert DashApp.objects.get(slug="json-state").json_state['inp1']['n_clicks'] == 3
+
+    # Only the parts of the state that are needed are read and written
+    stateful_a = DashApp.locate_dash_app("json-state")
+    with CaptureQueriesContext(connection) as queries:
+        stateful_a.prefetch_current_state_entries(["inp1", "out1b"])
+        assert stateful_a.have_current_state_entry("inp1", "n_clicks")
+        stateful_a.update_current_state("inp1", "n_clicks", 4)
+        stateful_a.update_current_state("out1b", "href", "http://www.example.com/b")
+        stateful_a.handle_current_state()
+    assert len(queries) == 2
+    assert not getattr(stateful_a, '_current_state_hydrated', None)
+    assert 'json_set' in queries[1]['sql'].lower()
+
+    # Components without any state are remembered as such, but not added to the state
+    stateful_a = DashApp.locate_dash_app("json-state")
+    with CaptureQueriesContext(connection) as queries:
+        stateful_a.prefetch_current_state_entries(["inp1", "no-such-component"])
+        assert not stateful_a.have_current_state_entry("no-such-component", "value")
+    assert len(queries) == 1
+    assert "no-such-component" not in stateful_a.current_state()
+
+    # Pattern matching ids are handled, falling back to reading all of the state if needed
+    stateful_a = DashApp.locate_dash_app("json-state")
+    stateful_a.update_current_state({"_type": "btn3", "_id": "inp-0"}, "n_clicks", 6)
+    stateful_a.handle_current_state()
+
+    state = DashApp.objects.get(slug="json-state").current_state()
+    assert state['inp1']['n_clicks'] == 4
+    assert state["out1b"]["href"] == "http://www.example.com/b"
+    assert state['{"_id":"inp-0","_type":"btn3"}']['n_clicks'] == 6
+
+    # Reverting to text storage keeps the state
+    settings.PLOTLY_DASH = {}
+    stateful_a = DashApp.locate_dash_app("json-state")
+    assert stateful_a.current_state()['inp1']['n_clicks'] == 4
+    stateful_a.update_current_state("inp1", "n_clicks", 5)
+    stateful_a.handle_current_state()
+    stateful_a = DashApp.objects.get(slug="json-state")
+    assert stateful_a.json_state is None
+    assert json.loads(stateful_a.base_state)['inp1']['n_clicks'] == 5
+
+
+def test_session_state_tracking():
+    'Check that changes to session state are detected, including changes to nested values'
+
+    from django_plotly_dash.util import SessionState
+
+    state = SessionState({'count': 1, 'user_counts': {'a': 1}, 'items': [1, 2]})
+    assert state.get('count') == 1
+    assert state['user_counts']['a'] == 1
+    assert list(state.items())
+    assert not state.has_changed()
+
+    state['user_counts']['a'] += 1
+    assert state.has_changed()
+
+    state = SessionState({'items': [1, 2]})
+    state.get('items').append(3)
+    assert state.has_changed()
+
+    state = SessionState()
+    assert state.setdefault('count', 0) == 0
+    assert state.has_changed()
+
+    state = SessionState({'count': 1})
+    state.pop('count')
+    assert state.has_changed()
+    assert SessionState({'count': 1}).setdefault('count', 0) == 1
+
+
+def input_output_app(name):
+    'Return an app with an input, with id inp, and two outputs, with ids out1 and out2'
+
+    from dash import html, dcc
+
+    ddash = DjangoDash(name=name)
+    ddash.layout = html.Div([dcc.Input(id="inp", value="x"),
+                             html.Div(id="out1"),
+                             html.Div(id="out2")])
+    return ddash
+
+
+def input_output_request(output, value):
+    'Return a request, with an empty session, for the update of an output of an input_output_app'
+
+    from django.contrib.sessions.backends.signed_cookies import SessionStore
+    from django.test import RequestFactory
+
+    request = RequestFactory().post("/", json.dumps({'output': output,
+                                                    'inputs': [{'id': 'inp', 'property': 'value',
+                                                                'value': value}]}),
+                                    content_type="application/json")
+    request.session = SessionStore()
+    return request
+
+
+@pytest.mark.django_db
+def test_session_only_used_when_wanted():
+    'Check that the session is only loaded and written for callbacks that are passed the session state'
+
+    from django_plotly_dash.views import update
+
+    ddash = input_output_app("SessionUseApp")
+
+    @ddash.expanded_callback(Output('out1', 'children'),
+                             [Input('inp', 'value')])
+    def without_session(value):
+        return value
+
+    @ddash.expanded_callback(Output('out2', 'children'),
+                             [Input('inp', 'value')])
+    def with_session(value, session_state):
+        if value == "count":
+            session_state['count'] = session_state.get('count', 0) + 1
+        return value
+
+    def post(output, value):
+        # No user is set, as the callbacks are not passed one
+        request = input_output_request(output, value)
+        response = update(request, "SessionUseApp", stateless=True)
+        assert response.status_code == 200
+        return request.session
+
+    session = post('out1.children', "count")
+    assert not session.accessed
+    assert not session.modified
+
+    session = post('out2.children', "read")
+    assert session.accessed
+    assert not session.modified
+
+    session = post('out2.children', "count")
+    assert session.modified
+    assert session['django_plotly_dash'] == {'count': 1}
+
+
+@pytest.mark.django_db
+def test_async_callbacks():
+    'Check that coroutine callbacks are awaited, through both the sync and async update views'
+
+    import asyncio
+
+    from asgiref.sync import async_to_sync
+
+    from django_plotly_dash.views import update, async_update
+
+    ddash = input_output_app("AsyncCallbackApp")
+
+    @ddash.expanded_callback(Output('out1', 'children'),
+                             [Input('inp', 'value')])
+    async def async_callback(value, session_state):
+        await asyncio.sleep(0)
+        session_state['seen'] = value
+        return "async " + value
+
+    @ddash.expanded_callback(Output('out2', 'children'),
+                             [Input('inp', 'value')])
+    def sync_callback(value):
+        return "sync " + value
+
+    for view in [update, async_to_sync(async_update)]:
+        request = input_output_request('out1.children', 'v')
+        response = view(request, "AsyncCallbackApp", stateless=True)
+        assert json.loads(response.content)['response'] == {'out1': {'children': 'async v'}}
+        assert request.session['django_plotly_dash'] == {'seen': 'v'}
+
+        response = view(input_output_request('out2.children', 'v'), "AsyncCallbackApp", stateless=True)
+        assert json.loads(response.content)['response'] == {'out2': {'children': 'sync v'}}
+
+
+@pytest.mark.django_db
+def test_process_pool_callbacks(client, settings):
+    'Check running demo callbacks in the process pool'
+
+    from django_plotly_dash.process_pool import shutdown_process_pool
+
+    settings.PLOTLY_DASH = {'process_pool_size': 1, 'process_pool_timeout': 120}
+
+    url = reverse('the_django_plotly_dash:app-update-component', kwargs={'ident': 'ProcessPoolCallbacks'})
+
+    def post(output):
+        response = client.post(url, json.dumps({'output': output,
+                                                'inputs': [{'id': 'sample-size',
+                                                            'property': 'value',
+                                                            'value': 1000}]}),
+                               content_type="application/json")
+        assert response.status_code == 200
+        return json.loads(response.content.decode('utf-8'))['response']
+
+    try:
+        expected = {i: sum(range(i, 1000, 10)) for i in range(10)}
+        assert post('summary.children') == {'summary': {'children': str(expected)}}
+
+        # Responses are encoded by the worker, and so are not streamed
+        settings.PLOTLY_DASH = {'process_pool_size': 1, 'process_pool_timeout': 120, 'stream_responses': True}
+        assert post('summary.children') == {'summary': {'children': str(expected)}}
+
+        # The request, and the stateless app, cannot be sent to a worker process
+        assert post('arguments.children') == {'arguments': {'children': ['callback_context',
+                                                                         'dash_app_id',
+                                                                         'session_state',
+                                                                         'user']}}
+    finally:
+        shutdown_process_pool()
+
+
+def test_process_pool_timeout(settings):
+    'Check that a pool whose worker is still running a callback that has timed out is replaced'
+
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+    from unittest.mock import MagicMock
+    from django_plotly_dash import process_pool
+
+    settings.PLOTLY_DASH = {'process_pool_timeout': 1}
+
+    pool = MagicMock()
+    pool.submit.return_value.result.side_effect = FutureTimeoutError
+    with patch.object(process_pool, '_process_pool', pool):
+        # A callback that has not started is cancelled, and the pool kept
+        pool.submit.return_value.cancel.return_value = True
+        with pytest.raises(FutureTimeoutError):
+            process_pool.run_in_process_pool(sum, [1, 2])
+        assert process_pool._process_pool is pool
+        assert not pool.shutdown.called
+
+        # A running callback cannot be cancelled, and so the pool is retired
+        pool.submit.return_value.cancel.return_value = False
+        with pytest.raises(FutureTimeoutError):
+            process_pool.run_in_process_pool(sum, [1, 2])
+        assert process_pool._process_pool is None
+        pool.shutdown.assert_called_once_with(wait=False)
+
+
+@pytest.mark.django_db
+def test_memoized_callbacks(settings):
+    'Check that the responses of memoized callbacks are reused for the same values'
+
+    from django.core.cache import caches
+
+    from django_plotly_dash.views import update
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                       'callbacks': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                     'LOCATION': 'test_memoized_callbacks'}}
+    settings.PLOTLY_DASH = {'callback_cache': 'callbacks'}
+
+    # The local memory cache is shared by every instance with the same location, so is emptied before and after use
+    caches['callbacks'].clear()
+    try:
+        ddash = input_output_app("MemoizedCallbackApp")
+        calls = []
+
+        @ddash.expanded_callback(Output('out1', 'children'),
+                                 [Input('inp', 'value')],
+                                 memoize=True)
+        def memoized(value):
+            calls.append(value)
+            return "memoized " + value
+
+        @ddash.expanded_callback(Output('out2', 'children'),
+                                 [Input('inp', 'value')],
+                                 memoize=60)
+        def user_specific(value, user):
+            calls.append(value)
+            return "user " + value
+
+        assert memoized.dispatch_record.memoize_timeout == 300
+        assert user_specific.dispatch_record.memoize_timeout is None
+
+        def post(output, value):
+            request = input_output_request(output, value)
+            request.user = "someone"
+            response = update(request, "MemoizedCallbackApp", stateless=True)
+            return json.loads(response.content)['response']
+
+        assert post('out1.children', 'a') == {'out1': {'children': 'memoized a'}}
+        assert post('out1.children', 'a') == {'out1': {'children': 'memoized a'}}
+        assert post('out1.children', 'b') == {'out1': {'children': 'memoized b'}}
+        assert calls == ['a', 'b']
+
+        assert post('out2.children', 'a') == {'out2': {'children': 'user a'}}
+        assert post('out2.children', 'a') == {'out2': {'children': 'user a'}}
+        assert calls == ['a', 'b', 'a', 'a']
+
+        # Responses that would otherwise be streamed are also memoized
+        settings.PLOTLY_DASH = {'callback_cache': 'callbacks', 'stream_responses': True}
+        assert post('out1.children', 'c') == {'out1': {'children': 'memoized c'}}
+        assert post('out1.children', 'c') == {'out1': {'children': 'memoized c'}}
+        assert calls == ['a', 'b', 'a', 'a', 'c']
+    finally:
+        caches['callbacks'].clear()
+
+
+@pytest.mark.django_db
+def test_batched_updates(client):
+    'Check dispatching a number of callbacks in one request, through the sync and async views'
+
+    from asgiref.sync import async_to_sync
+    from django.contrib.sessions.backends.signed_cookies import SessionStore
+    from django.test import RequestFactory
+
+    import dash
+    from django_plotly_dash.dash_wrapper import WrappedDash
+    from django_plotly_dash.views import async_batch_update
+
+    url = reverse('the_django_plotly_dash:app-update-components', kwargs={'ident': 'flexible_expanded_callbacks'})
+
+    def body_for(output):
+        return {'output': output,
+                'inputs': [{'id': 'button', 'property': 'n_clicks', 'value': '10'}]}
+
+    bodies = json.dumps([body_for('output-two.children'),
+                         body_for('output-three.children'),
+                         body_for('no-such-output.children')])
+    expected = [{'status': 200, 'content': {'response': {'output-two': {'children': 'ok'}}, 'multi': True}},
+                {'status': 200, 'content': {'response': {'output-three': {'children': 'flexible_expanded_callbacks'}},
+                                            'multi': True}},
+                {'status': 500, 'content': None}]
+
+    response = client.post(url, bodies, content_type="application/json")
+    assert response.status_code == 200
+    assert json.loads(response.content) == expected
+
+    # Each callback sees the global callback context of its own request
+    prepare_dispatch = WrappedDash._prepare_dispatch
+    contexts = []
+
+    def checked_prepare_dispatch(self, body, argMap):
+        prepared = prepare_dispatch(self, body, argMap)
+        callback = prepared[0]
+
+        def checked_callback(*args, **kwargs):
+            contexts.append((body['output'], dash.callback_context.outputs_list['id']))
+            return callback(*args, **kwargs)
+        return (checked_callback,) + prepared[1:]
+
+    request = RequestFactory().post(url, bodies, content_type="application/json")
+    request.session = SessionStore()
+    with patch.object(WrappedDash, '_prepare_dispatch', checked_prepare_dispatch):
+        response = async_to_sync(async_batch_update)(request, 'flexible_expanded_callbacks', stateless=True)
+    assert json.loads(response.content) == expected
+    assert contexts == [('output-two.children', 'output-two'), ('output-three.children', 'output-three')]
+
+    response = client.post(url, json.dumps(body_for('output-two.children')), content_type="application/json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_streamed_responses(client, settings):
+    'Check that streamed callback and layout responses match those formed in memory'
+
+    import numpy as np
+    from django_plotly_dash._patches import iter_json_django_plotly, to_json_django_plotly
+
+    value = {'figure': {'data': [{'x': np.arange(2500), 'y': list(range(2500))}]},
+             'children': [{'props': {'children': 'a'}}, 1, 'b', []],
+             'empty': {}}
+    assert json.loads("".join(iter_json_django_plotly(value, 1000))) == json.loads(to_json_django_plotly(value))
+
+    # Values below the chunking level are encoded in one piece, with the settings read once
+    from django_plotly_dash import _patches
+
+    value = {'rows': [{'a': i, 'b': [i, str(i)]} for i in range(2500)], 'title': 'rows'}
+    with patch.object(_patches, 'typed_array_threshold', wraps=_patches.typed_array_threshold) as threshold:
+        pieces = list(iter_json_django_plotly(value, 1000))
+    assert threshold.call_count == 1
+    assert len(pieces) <= 10
+    assert json.loads("".join(pieces)) == json.loads(to_json_django_plotly(value))
+
+    update_url = reverse('the_django_plotly_dash:app-update-component', kwargs={'ident': 'FlexibleExpandedCallbacks'})
+    layout_url = reverse('the_django_plotly_dash:layout', kwargs={'ident': 'simpleexample-1'})
+    update_body = json.dumps({'output': 'output-two.children',
+                              'inputs': [{'id': 'button', 'property': 'n_clicks', 'value': '10'}]})
+
+    responses = []
+    for streamed in [False, True]:
+        settings.PLOTLY_DASH = {'stream_responses': streamed}
+
+        update_response = client.post(update_url, update_body, content_type="application/json")
+        layout_response = client.get(layout_url)
+        assert update_response.streaming == streamed
+        assert layout_response.streaming == streamed
+
+        responses.append([json.loads(b"".join(response.streaming_content) if streamed else response.content)
+                          for response in (update_response, layout_response)])
+
+    assert responses[0] == responses[1]
+
+
+def test_serializer(settings):
+    'Check that the json and orjson engines encode and decode values in the same way'
+
+    import numpy as np
+    from django.utils.safestring import mark_safe
+    from django.utils.translation import gettext_lazy
+    from django_plotly_dash import serializer
+
+    value = {'figure': {'data': [{'x': np.arange(5), 'y': [1.5, 2.5, None]}]},
+             'label': gettext_lazy("Some text"),
+             'children': [{'props': {'children': 'a'}}, 1, 'b', []]}
+
+    results = []
+    for engine in ['json', 'orjson']:
+        settings.PLOTLY_DASH = {'json_engine': engine}
+        assert serializer.selected_engine() == engine
+
+        encoded = serializer.dumps(value)
+        assert ": " not in encoded
+        results.append(serializer.loads(encoded))
+        assert serializer.loads(mark_safe(encoded)) == results[-1]
+
+    assert results[0] == results[1]
+    assert results[0]['figure']['data'][0]['x'] == [0, 1, 2, 3, 4]
+    assert results[0]['label'] == "Some text"
+
+    # Lazy translation strings can also be used as keys with orjson
+    from django_plotly_dash._patches import to_json_django_plotly
+
+    settings.PLOTLY_DASH = {'json_engine': 'orjson'}
+    assert serializer.dumps({gettext_lazy("a"): 1}) == '{"a":1}'
+    assert to_json_django_plotly({gettext_lazy("a"): np.arange(2)}) == '{"a":[0,1]}'
+
+    settings.PLOTLY_DASH = {'json_engine': 'unknown'}
+    with pytest.raises(ValueError):
+        serializer.selected_engine()
+
+
+def test_orjson_default_hook():
+    'Check that the orjson default hook encodes a large figure as the previous double clean pass did, without it'
+
+    import numpy as np
+    import orjson
+    import plotly.graph_objs as go
+    from django.utils.translation import gettext_lazy
+    from plotly.io._json import clean_to_json_compatible
+    from django_plotly_dash import _patches
+    from django_plotly_dash._patches import _json_modules, promise_clean_to_json_compatible, to_json_django_plotly
+
+    def previous_encoding(value):
+        cleaned = clean_to_json_compatible(value, numpy_allowed=True, datetime_allowed=True, modules=_json_modules())
+        return orjson.dumps(promise_clean_to_json_compatible(cleaned),
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf8")
+
+    figure = go.Figure(data=[go.Scatter(x=np.arange(20000), y=list(range(20000))),
+                             go.Scatter(x=np.arange(20000)[::2], y=np.linspace(0, 1, 10000))]).to_dict()
+    figure['data'][0]['name'] = gettext_lazy("Series")
+    figure['layout']['title'] = {'text': gettext_lazy("A title")}
+    value = {'response': {'graph': {'figure': figure, 'labels': [gettext_lazy("Label")] * 100}}}
+
+    # Only the values that need it are passed to the hook, so the whole value is never cleaned
+    with patch.object(_patches, 'clean_to_json_compatible', wraps=clean_to_json_compatible) as clean:
+        encoded = to_json_django_plotly(value, engine="orjson")
+    assert clean.call_count == 0
+    assert json.loads(encoded) == json.loads(previous_encoding(value))
+
+    with pytest.raises(TypeError):
+        to_json_django_plotly({'value': object()}, engine="orjson")
+
+
+def test_typed_arrays(settings):
+    'Check that large numpy arrays are sent as typed arrays when enabled'
+
+    import base64
+    import numpy as np
+    from django_plotly_dash import serializer
+    from django_plotly_dash._patches import iter_json_django_plotly, to_json_django_plotly
+
+    value = {'figure': {'data': [{'x': np.arange(1000), 'y': np.linspace(0, 1, 1000), 'z': np.arange(10),
+                                  'text': np.array(['a'] * 1000)}]}}
+
+    settings.PLOTLY_DASH = {}
+    assert json.loads(to_json_django_plotly(value))['figure']['data'][0]['x'] == list(range(1000))
+
+    settings.PLOTLY_DASH = {'typed_array_threshold': 100}
+    for encode in [lambda v: to_json_django_plotly(v, engine="json"),
+                   lambda v: to_json_django_plotly(v, engine="orjson"),
+                   serializer.dumps,
+                   lambda v: "".join(iter_json_django_plotly(v))]:
+        trace = json.loads(encode(value))['figure']['data'][0]
+
+        assert trace['x']['dtype'] == 'i2'
+        assert np.array_equal(np.frombuffer(base64.b64decode(trace['x']['bdata']), dtype=np.int16), np.arange(1000))
+        assert trace['y']['dtype'] == 'f8'
+        assert np.array_equal(np.frombuffer(base64.b64decode(trace['y']['bdata'])), np.linspace(0, 1, 1000))
+
+        # Small arrays and arrays without a typed equivalent are still sent as lists
+        assert trace['z'] == list(range(10))
+        assert trace['text'] == ['a'] * 1000
+
+    import pandas as pd
+
+    value = {'figure': {'data': [{'x': pd.Series(np.arange(1000)), 'marker': {'color': np.arange(1000)},
+                                  'y': np.float64(1.5)}]},
+             'data': np.arange(1000),
+             'scale': np.float64(1.5)}
+    for encode in [lambda v: to_json_django_plotly(v, engine="json"),
+                   lambda v: to_json_django_plotly(v, engine="orjson"),
+                   serializer.dumps,
+                   lambda v: "".join(iter_json_django_plotly(v))]:
+        result = json.loads(encode(value))
+
+        # Series are sent in the same way as arrays, as are arrays of nested attributes of traces
+        trace = result['figure']['data'][0]
+        assert trace['x']['dtype'] == 'i2'
+        assert trace['marker']['color']['dtype'] == 'i2'
+
+        # Numpy scalars, and arrays outside of figures, are sent as numbers
+        assert trace['y'] == 1.5
+        assert result['scale'] == 1.5
+        assert result['data'] == list(range(1000))
+
+
+@pytest.mark.django_db
+def test_layout_etags_and_compression(client, settings):
+    'Check conditional layout requests, and compression of responses'
+
+    import gzip
+    from django_plotly_dash.dash_wrapper import DjangoDash
+
+    layout_url = reverse('the_django_plotly_dash:layout', kwargs={'ident': 'simpleexample-1'})
+
+    response = client.get(layout_url)
+    etag = response['ETag']
+    assert response.status_code == 200
+    assert response['Last-Modified']
+    assert 'no-cache' in response['Cache-Control']
+
+    # Repeated requests are not modified, without forming the layout again
+    with patch.object(DjangoDash, 'do_form_dash_instance') as do_form_dash_instance:
+        response = client.get(layout_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert response['Last-Modified']
+        assert not do_form_dash_instance.called
+
+    # A change to the state of the app alters the layout
+    dash_app = DashApp.objects.get(slug='simpleexample-1')
+    dash_app.update_current_state('dropdown-color', 'value', 'blue')
+    dash_app.handle_current_state()
+    dash_app.save()
+
+    response = client.get(layout_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+    settings.PLOTLY_DASH = {'compression_threshold': 100}
+
+    response = client.get(layout_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    assert response['ETag'].startswith('W/')
+    assert json.loads(gzip.decompress(response.content)) == json.loads(client.get(layout_url).content)
+
+    # The weakened ETag is still used for conditional requests
+    assert client.get(layout_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    dependencies_url = reverse('the_django_plotly_dash:dependencies', kwargs={'ident': 'simpleexample-1'})
+    response = client.get(dependencies_url, HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+
+    settings.PLOTLY_DASH = {'compression_threshold': 10**9}
+    assert not client.get(layout_url, HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding')
+
+    # Gzip content is padded as by the GZipMiddleware, and callback responses are never compressed with brotli
+    from unittest.mock import MagicMock
+    from django.middleware.gzip import GZipMiddleware
+    from django_plotly_dash import views
+
+    settings.PLOTLY_DASH = {'compression_threshold': 100}
+    update_url = reverse('the_django_plotly_dash:app-update-components',
+                         kwargs={'ident': 'flexible_expanded_callbacks'})
+    update_body = json.dumps([{'output': 'output-two.children',
+                               'inputs': [{'id': 'button', 'property': 'n_clicks', 'value': '10'}]}] * 20)
+
+    brotli = MagicMock()
+    brotli.compress.return_value = b"compressed"
+    with patch.object(views, 'brotli', brotli), \
+         patch.object(views, 'compress_string', wraps=views.compress_string) as compress_string:
+        response = client.post(update_url, update_body, content_type="application/json",
+                               HTTP_ACCEPT_ENCODING='br, gzip')
+        assert response['Content-Encoding'] == 'gzip'
+        content = json.loads(gzip.decompress(response.content))
+        assert content[0]['content']['response'] == {'output-two': {'children': 'ok'}}
+        assert compress_string.call_args.kwargs['max_random_bytes'] == GZipMiddleware.max_random_bytes
+
+        assert client.get(layout_url, HTTP_ACCEPT_ENCODING='br, gzip')['Content-Encoding'] == 'br'
+
+
+@pytest.mark.django_db
+def test_direct_static_urls(client, settings):
+    'Check that component suites can be referenced by their static URLs'
+
+    from dash import html
+    from .app_name import main_view_label
+
+    ddash = DjangoDash(name="DirectStaticUrls", serve_locally=True)
+    ddash.layout = html.Div("Some content")
+    url = reverse('the_django_plotly_dash:app-%s' % main_view_label, kwargs={'ident': 'DirectStaticUrls'})
+
+    index = client.get(url).content.decode('utf-8')
+    assert '_dash-component-suites/dash/dcc/dash_core_components' in index
+
+    settings.PLOTLY_DASH = {'direct_static_urls': True}
+    index = client.get(url).content.decode('utf-8')
+    assert '_dash-component-suites/' not in index
+    assert '/static/dash/component/dash/dcc/dash_core_components.js?v=v' in index
+
+    # Fingerprinted resources are redirected with headers allowing them to be cached indefinitely
+    suite_url = reverse('the_django_plotly_dash:component-suites',
+                        kwargs={'ident': 'simpleexample-1', 'component': 'dash',
+                                'resource': 'dash-renderer.v1_0_0m1234.min.js'})
+    response = client.get(suite_url)
+    assert response.status_code == 302
+    assert response.url == '/static/dash/component/dash/dash-renderer.min.js'
+    assert 'immutable' in response['Cache-Control']
+
+
+def test_collect_dash_static(settings, tmp_path):
+    'Check that static files are collected, and that unchanged sources are skipped when collecting again'
+
+    import io
+    import os
+    import dash
+    from django.core.management import call_command
+
+    settings.STATIC_ROOT = str(tmp_path)
+
+    def collect(*args):
+        output = io.StringIO()
+        call_command("collectdashstatic", *args, stdout=output)
+        return output.getvalue()
+
+    assert ", 0 unchanged sources skipped" in collect("--workers", "4")
+    with open(os.path.join(os.path.dirname(dash.__file__), "dcc", "dash_core_components.js"), "rb") as source:
+        with open(tmp_path / "dash" / "component" / "dash" / "dcc" / "dash_core_components.js", "rb") as target:
+            assert source.read() == target.read()
+
+    manifest = json.loads((tmp_path / "django_plotly_dash_static.json").read_text())
+    assert "dash_core_components.js" in manifest["DashComponentFinder:dash/dcc"]["files"]
+
+    assert collect().startswith("0 files copied from 0 sources")
+    assert not collect("--force").startswith("0 files")
+
+    # Files of sources that have been dropped, or that are no longer part of a source, are removed
+    manifest = json.loads((tmp_path / "django_plotly_dash_static.json").read_text())
+    manifest["DashComponentFinder:dropped"] = {"fingerprint": "", "prefix": "dash/component/dropped",
+                                               "files": ["dropped.js"]}
+    manifest["DashComponentFinder:dash/dcc"]["files"].append("stale.js")
+    (tmp_path / "django_plotly_dash_static.json").write_text(json.dumps(manifest))
+    os.makedirs(tmp_path / "dash" / "component" / "dropped")
+    for stale in [tmp_path / "dash" / "component" / "dropped" / "dropped.js",
+                  tmp_path / "dash" / "component" / "dash" / "dcc" / "stale.js"]:
+        stale.write_text("")
+
+    collect("--force")
+    assert not (tmp_path / "dash" / "component" / "dropped" / "dropped.js").exists()
+    assert not (tmp_path / "dash" / "component" / "dash" / "dcc" / "stale.js").exists()
+    assert (tmp_path / "dash" / "component" / "dash" / "dcc" / "dash_core_components.js").exists()
+
+
+def test_app_modules(settings):
+    'Check that asset locations can be found from a list of app modules, and the recording of the caller module'
+
+    import sys
+    from django_plotly_dash.finders import DashAssetFinder
+
+    assert DjangoDash(name="CallerModule").caller_module is sys.modules[__name__]
+
+    settings.PLOTLY_DASH = {}
+    from_urls = DashAssetFinder()
+
+    settings.PLOTLY_DASH = {'app_modules': ['demo.plotly_apps', 'demo.dash_apps', 'demo.no_such_module']}
+    with patch('importlib.import_module') as import_module:
+        from_modules = DashAssetFinder()
+        assert not import_module.called
+
+    assert from_modules.locations == ['demo.plotly_apps', 'demo.dash_apps']
+    assert ({(storage.location, storage.prefix) for storage in from_modules.storages.values()} ==
+            {(storage.location, storage.prefix) for storage in from_urls.storages.values()
+             if storage.prefix.startswith(('dpd/assets/demo/plotly_apps', 'dpd/assets/demo/dash_apps'))})
@@ -29,6 +29,9 @@ from django.views.decorators.csrf import csrf_exempt
 
 from .views import routes, layout, dependencies, update, main_view, component_suites, component_component_suites, asset_redirection, component_suites_build
 from .views import add_stateless_apps
+from .views import batch_update
+from .views import async_layout, async_dependencies, async_update, async_batch_update
+from .util import async_views
 
 from .app_name import app_name, main_view_label
 
@@ -38,6 +41,9 @@ urlpatterns = [
     path('add_stateless_apps',add_stateless_apps,name='add_stateless_apps'),
     ]
 
+if async_views():
+    layout, dependencies, update, batch_update = async_layout, async_dependencies, async_update, async_batch_update
+
 for base_type, args, name_prefix, url_ending, name_suffix in [('instance', {}, '', '', '', ),
                                                               ('app', {'stateless':True}, 'app-', '', '', ),
                                                               ('instance', {}, '', '/initial/<slug:cache_id>', '--args', ),
@@ -48,6 +54,7 @@ for base_type, args, name_prefix, url_ending, name_suffix in [('instance', {}, '
                                                       ('_dash-layout', layout, 'layout', '', ),
                                                       ('_dash-dependencies', dependencies, 'dependencies', '', ),
                                                       ('_dash-update-component', csrf_exempt(update), 'update-component', '', ),
+                                                      ('_dash-update-components', csrf_exempt(batch_update), 'update-components', '', ),
                                                       ('', main_view, main_view_label, '', ),
                                                       ('_dash-component-suites', component_suites, 'component-suites', '/<slug:component>/<resource>', ),
                                                       ('_dash-component-suites', component_suites, 'component-suites', '/<slug:component>/<slug:cpe2>/<resource>', ),
@@ -22,7 +22,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 
 '''
-import json
+import copy
 import uuid
 
 
@@ -30,19 +30,21 @@ from _plotly_utils.optional_imports import get_module
 
 
 from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core.cache import cache
 from django.utils.module_loading import import_string
 
 from django_plotly_dash._patches import DjangoPlotlyJSONEncoder
+from django_plotly_dash._settings import _get_settings, json_engine, typed_array_threshold # pylint: disable=unused-import
+from django_plotly_dash.serializer import loads
 
+try:
+    from dash.fingerprint import check_fingerprint
+except:
+    # check_fingerprint not available, fake it
+    def check_fingerprint(resource):
+        return resource, None
 
-def _get_settings():
-    try:
-        the_settings = settings.PLOTLY_DASH
-    except AttributeError:
-        the_settings = None
-
-    return the_settings if the_settings else {}
 
 def pipe_ws_endpoint_name():
     'Return the endpoint for pipe websocket connections'
@@ -84,7 +86,7 @@ def store_initial_arguments(request, initial_arguments=None):
 
     # convert to dict is json string
     if isinstance(initial_arguments, str):
-        initial_arguments = json.loads(initial_arguments)
+        initial_arguments = loads(initial_arguments)
 
     # Generate a cache id
     cache_id = "dpd-initial-args-%s" % str(uuid.uuid4()).replace('-', '')
@@ -108,6 +110,50 @@ def get_initial_arguments(request, cache_id=None):
 
     return request.session[cache_id]
 
+def dash_app_cache_timeout():
+    'Return timeout, in seconds, for caching DashApp instances, or None if they are not to be cached'
+    return _get_settings().get('cache_timeout_dash_apps', None)
+
+def dash_app_cache_name():
+    'Return the name of the Django cache used for DashApp instances'
+    return _get_settings().get('dash_app_cache', 'default')
+
+def cache_timeout_callbacks():
+    'Return timeout, in seconds, for memoized callback responses'
+    return _get_settings().get('cache_timeout_callbacks', 300)
+
+def callback_cache_name():
+    'Return the name of the Django cache used for memoized callback responses'
+    return _get_settings().get('callback_cache', 'default')
+
+def compression_threshold():
+    'Return the minimum size, in bytes, of responses that are compressed, or None if they are not compressed'
+    return _get_settings().get('compression_threshold', None)
+
+def stream_responses():
+    'Return True if callback and layout responses are to be streamed rather than formed in memory'
+    return _get_settings().get('stream_responses', False)
+
+def batch_updates():
+    'Return True if callback requests made by the browser are to be coalesced into batched requests'
+    return _get_settings().get('batch_updates', False)
+
+def async_views():
+    'Return True if the async variants of the layout, dependencies and update views are to be used'
+    return _get_settings().get('async_views', False)
+
+def process_pool_size():
+    'Return the number of worker processes for running callbacks, or None for the number of processors'
+    return _get_settings().get('process_pool_size', None)
+
+def process_pool_timeout():
+    'Return the time, in seconds, to wait for a callback run in a worker process, or None to wait indefinitely'
+    return _get_settings().get('process_pool_timeout', 60)
+
+def state_storage():
+    'Return the storage used for the state of DashApp instances, either "text" or "json"'
+    return _get_settings().get('state_storage', 'text')
+
 def static_asset_root():
     return _get_settings().get('static_asset_root','dpd/assets')
 
@@ -123,6 +169,14 @@ def static_asset_path(module_name, asset_path):
 def serve_locally():
     return _get_settings().get('serve_locally', False)
 
+def external_redirection_prefixes():
+    'Return the url path prefixes of responses rewritten by the ExternalRedirectionMiddleware, or None for all paths'
+    return _get_settings().get('external_redirection_prefixes', None)
+
+def instance_cache_size():
+    'Return the maximum number of dash instances to retain, per app, for reuse across requests'
+    return _get_settings().get('instance_cache_size', 64)
+
 def static_path(relative_path):
     try:
         static_url = settings.STATIC_URL
@@ -130,6 +184,33 @@ def static_path(relative_path):
         static_url = '/static/'
     return "%s%s" %(static_url, relative_path)
 
+def direct_static_urls():
+    'Return True if component suites are referenced directly by their static file URLs, rather than through redirects'
+    return _get_settings().get('direct_static_urls', False)
+
+def component_static_url(resource):
+    '''
+    Return the static file URL of a, possibly fingerprinted, dash component resource
+
+    The URL is provided by the static files storage, so that it is hashed if the storage hashes file names. Otherwise
+    the fingerprint of the resource is retained as a query parameter.
+    '''
+    path, has_fingerprint = check_fingerprint(resource)
+    relative_path = "dash/component/%s" % path
+    plain_url = static_path(relative_path)
+    try:
+        url = staticfiles_storage.url(relative_path)
+    except ValueError:
+        # Not present in the manifest of a storage that hashes file names
+        url = plain_url
+    if url == plain_url and has_fingerprint:
+        url = "%s?v=%s" % (url, resource.split("/")[-1].split(".")[1])
+    return url
+
+def app_modules():
+    'Return the names of the modules that define dash apps, or None if they are found by importing the URLConf'
+    return _get_settings().get('app_modules', None)
+
 def stateless_app_lookup_hook():
     'Return a function that performs lookup for aa stateless app, given its name, or returns None'
 
@@ -142,3 +223,92 @@ def stateless_app_lookup_hook():
     return lambda _: None
 
 
+
+
+# Values that cannot be changed in place, and so do not need to be checked for changes
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None),)
+
+_MISSING = object()
+
+
+class SessionState(dict):
+    '''
+    Session state passed to a callback, recording whether or not it has been changed.
+
+    Assigning or removing entries marks the state as changed. Mutable values, such as a dict
+    within the state, are copied when first read and compared against that copy afterwards.
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changed = False
+        self._read_values = {}
+
+    def _reading(self, key, value):
+        if not isinstance(value, _IMMUTABLE_TYPES) and key not in self._read_values:
+            self._read_values[key] = copy.deepcopy(value)
+        return value
+
+    def _reading_all(self):
+        for key, value in super().items():
+            self._reading(key, value)
+
+    def has_changed(self):
+        'Return True if the state has been changed'
+        if self.changed:
+            return True
+        return any(super(SessionState, self).get(key, _MISSING) != value
+                   for key, value in self._read_values.items())
+
+    def __getitem__(self, key):
+        return self._reading(key, super().__getitem__(key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self._reading(key, super().__getitem__(key))
+        return default
+
+    def values(self):
+        self._reading_all()
+        return super().values()
+
+    def items(self):
+        self._reading_all()
+        return super().items()
+
+    def copy(self):
+        self._reading_all()
+        return dict(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self.changed = True
+        return super().setdefault(key, default)
+
+    def __setitem__(self, key, value):
+        self.changed = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.changed = True
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self.changed = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.changed = True
+        return super().popitem()
+
+    def clear(self):
+        self.changed = True
+        super().clear()
+
+    def update(self, *args, **kwargs): # pylint: disable=arguments-differ
+        self.changed = True
+        super().update(*args, **kwargs)
+
+    def __ior__(self, other):
+        self.changed = True
+        return super().__ior__(other)
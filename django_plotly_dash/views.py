@@ -24,24 +24,46 @@ SOFTWARE.
 
  # pylint: disable=unused-argument
 
-import json
+import logging
+import re
 from json import JSONDecodeError
 
-from django.http import HttpResponse, HttpResponseRedirect
+from asgiref.sync import sync_to_async
+
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.middleware.gzip import GZipMiddleware
 from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_sequence, compress_string
 
 from dash.exceptions import PreventUpdate
 
 try:
-    from dash.fingerprint import check_fingerprint
-except:
-    # check_fingerprint not available, fake it
-    def check_fingerprint(resource):
-        return resource, None
+    import brotli
+except ImportError:
+    brotli = None
 
 
+from .dash_wrapper import LazyArgument
 from .models import DashApp, check_stateless_loaded
-from .util import get_initial_arguments, static_path
+from ._patches import StreamedJson
+from . import serializer
+from .util import get_initial_arguments, static_path, SessionState, stream_responses, compression_threshold
+from .util import check_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Lifetime, in seconds, of responses that do not change
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_accepts_gzip = re.compile(r"\bgzip\b")
+_accepts_brotli = re.compile(r"\bbr\b")
+
+# Random padding added to gzip content as a mitigation of the BREACH attack, as done by the GZipMiddleware.
+# This is only available with Django 4.2 and later.
+_gzip_padding = ({'max_random_bytes': GZipMiddleware.max_random_bytes}
+                 if hasattr(GZipMiddleware, 'max_random_bytes') else {})
 
 def routes(*args, **kwargs):
     'Return routes'
@@ -49,26 +71,70 @@ def routes(*args, **kwargs):
 
 def dependencies(request, ident, stateless=False, **kwargs):
     'Return the dependencies'
-    _, app = DashApp.locate_item(ident, stateless)
+    dash_app = DashApp.locate_dash_app(ident, stateless)
+    return _dependencies_response(request, dash_app)
+
+async def async_dependencies(request, ident, stateless=False, **kwargs):
+    'Return the dependencies, from async code'
+    dash_app = await sync_to_async(DashApp.locate_dash_app)(ident, stateless)
+    return _dependencies_response(request, dash_app)
+
+def _dependencies_response(request, dash_app):
+    data, mimetype, etag = dash_app.dependencies_response_data()
 
-    with app.app_context():
-        view_func = app.locate_endpoint_function('dash-dependencies')
-        resp = view_func()
-        return HttpResponse(resp.data,
-                            content_type=resp.mimetype)
+    not_modified = _not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(data,
+                            content_type=mimetype)
+    response['ETag'] = etag
+    return _compressed_response(request, response)
 
 def layout(request, ident, stateless=False, cache_id=None, **kwargs):
     'Return the layout of the dash application'
-    _, app = DashApp.locate_item(ident, stateless)
-
-    view_func = app.locate_endpoint_function('dash-layout')
-    resp = view_func()
+    dash_app = DashApp.locate_dash_app(ident, stateless)
 
     initial_arguments = get_initial_arguments(request, cache_id)
 
-    response_data, mimetype = app.augment_initial_layout(resp, initial_arguments)
-    return HttpResponse(response_data,
-                        content_type=mimetype)
+    # An unchanged layout is not formed again
+    etag, last_modified = dash_app.layout_validators(initial_arguments)
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    if etag is not None:
+        not_modified = _not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+    app = dash_app.as_dash_instance(cache_id=cache_id)
+
+    if stream_responses():
+        # Streamed responses are not rewritten by middleware
+        response_data, mimetype = app.layout_response_data(initial_arguments, stream=True)
+        if isinstance(response_data, StreamedJson):
+            response = StreamingHttpResponse(response_data,
+                                             content_type=mimetype)
+        else:
+            response = StreamingHttpResponse([response_data],
+                                             content_type=mimetype)
+    else:
+        response_data, mimetype = app.layout_response_data(initial_arguments)
+        response = HttpResponse(response_data,
+                                content_type=mimetype)
+
+    if etag is not None:
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Browsers should check that the layout is unchanged before reusing it
+        patch_cache_control(response, no_cache=True)
+
+    return _compressed_response(request, response)
+
+async def async_layout(request, ident, stateless=False, cache_id=None, **kwargs):
+    'Return the layout of the dash application, from async code'
+    # Forming the layout can run app code, such as a layout function, that expects a sync context
+    return await sync_to_async(layout)(request, ident, stateless, cache_id, **kwargs)
 
 def update(request, ident, stateless=False, **kwargs):
     try:
@@ -76,30 +142,161 @@ def update(request, ident, stateless=False, **kwargs):
     except PreventUpdate:
         return HttpResponse(status=204)
 
+async def async_update(request, ident, stateless=False, **kwargs):
+    'Generate update json response from async code, awaiting callbacks that are coroutines'
+    try:
+        return await _async_update(request, ident, stateless, **kwargs)
+    except PreventUpdate:
+        return HttpResponse(status=204)
+
 def _update(request, ident, stateless=False, **kwargs):
     'Generate update json response'
-    dash_app, app = DashApp.locate_item(ident, stateless)
+    # The layout is not needed, so neither is the full state of the app
+    dash_app, app = DashApp.locate_item(ident, stateless, with_state=False)
+
+    request_body = _update_request_body(request)
+    if request_body is None:
+        return HttpResponse(status=200)
+
+    arg_map, app_state = _update_arguments(request, ident, dash_app, lambda: request.user)
+    resp = app.dispatch_with_args(request_body, arg_map)
+    _complete_update(request, dash_app, app_state)
+
+    return _update_response(request, resp)
+
+async def _async_update(request, ident, stateless=False, **kwargs):
+    dash_app, app = await sync_to_async(DashApp.locate_item)(ident, stateless, with_state=False)
+
+    request_body = _update_request_body(request)
+    if request_body is None:
+        return HttpResponse(status=200)
+
+    arg_map, app_state = _update_arguments(request, ident, dash_app, lambda: _loaded_user(request))
+    resp = await app.async_dispatch_with_args(request_body, arg_map)
+    await sync_to_async(_complete_update)(request, dash_app, app_state)
+
+    return _update_response(request, resp)
 
+def batch_update(request, ident, stateless=False, **kwargs):
+    'Generate the json responses to a list of callback requests, in order'
+    dash_app, app = DashApp.locate_item(ident, stateless, with_state=False)
+
+    request_bodies = _update_request_body(request)
+    if not isinstance(request_bodies, list):
+        return HttpResponse(status=400)
+
+    # The app, user and session are shared by all of the callbacks
+    arg_map, app_state = _update_arguments(request, ident, dash_app, lambda: request.user)
+
+    results = []
+    for request_body in request_bodies:
+        try:
+            results.append(_batch_result(app.dispatch_with_args(request_body, dict(arg_map))))
+        except Exception as exc: # pylint: disable=broad-except
+            results.append(_batch_error(exc))
+
+    _complete_update(request, dash_app, app_state)
+
+    return _batch_response(request, results)
+
+async def async_batch_update(request, ident, stateless=False, **kwargs):
+    '''
+    Generate the json responses to a list of callback requests from async code
+
+    The callbacks are dispatched one after another, as each one sets the global dash.callback_context
+    '''
+    dash_app, app = await sync_to_async(DashApp.locate_item)(ident, stateless, with_state=False)
+
+    request_bodies = _update_request_body(request)
+    if not isinstance(request_bodies, list):
+        return HttpResponse(status=400)
+
+    arg_map, app_state = _update_arguments(request, ident, dash_app, lambda: _loaded_user(request))
+
+    async def dispatch(request_body):
+        try:
+            return _batch_result(await app.async_dispatch_with_args(request_body, dict(arg_map)))
+        except Exception as exc: # pylint: disable=broad-except
+            return _batch_error(exc)
+
+    results = [await dispatch(request_body) for request_body in request_bodies]
+
+    await sync_to_async(_complete_update)(request, dash_app, app_state)
+
+    return _batch_response(request, results)
+
+def _batch_result(resp):
+    'Return the status and content of a successful callback within a batch'
+    if isinstance(resp, str) and resp == 'EDGECASEEXIT':
+        return 204, None
+    if isinstance(resp, StreamedJson):
+        return 200, resp.to_json()
+    content = getattr(resp, 'data', resp)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return 200, content
+
+def _batch_error(exc):
+    'Return the status and content of a failed callback within a batch'
+    if isinstance(exc, PreventUpdate):
+        return 204, None
+    logger.error("django-plotly-dash: Callback failed within a batched update", exc_info=exc)
+    return 500, None
+
+def _batch_response(request, results):
+    'Form a response from the status and json content of each callback in a batch'
+    entries = ['{"status":%i,"content":%s}' % (status, content if content is not None else 'null')
+               for status, content in results]
+    return _compressed_response(request, HttpResponse("[%s]" % ",".join(entries),
+                                                      content_type="application/json"),
+                                allow_brotli=False)
+
+def _update_request_body(request):
+    'Return the content of an update request, or None if it cannot be parsed'
     try:
-        request_body = json.loads(request.body.decode('utf-8'))
+        return serializer.loads(request.body)
     except (JSONDecodeError, UnicodeDecodeError):
-        return HttpResponse(status=200)
+        return None
 
-    # Use direct dispatch with extra arguments in the argMap
-    app_state = request.session.get("django_plotly_dash", dict())
+def _loaded_user(request):
+    'Return the user of a request, having loaded it so that it can be used from async code'
+    user = request.user
+    user.is_authenticated # pylint: disable=pointless-statement
+    return user
+
+def _update_arguments(request, ident, dash_app, user_func):
+    '''
+    Form the extra arguments for a callback, along with the session state argument.
+
+    The user and the session are only looked up if the callback is passed them.
+    '''
+    app_state = LazyArgument(lambda: SessionState(request.session.get("django_plotly_dash", dict())))
     arg_map = {'dash_app_id': ident,
                'dash_app': dash_app,
-               'user': request.user,
+               'user': LazyArgument(user_func),
                'request':request,
                'session_state': app_state}
-    resp = app.dispatch_with_args(request_body, arg_map)
-    request.session['django_plotly_dash'] = app_state
+    return arg_map, app_state
+
+def _complete_update(request, dash_app, app_state):
+    'Persist any changes to session and app state made while handling an update'
+    # Only write the session state back if it has changed
+    if app_state.evaluated and app_state.value.has_changed():
+        request.session['django_plotly_dash'] = dict(app_state.value)
     dash_app.handle_current_state()
 
+def _update_response(request, resp):
+    'Form the response to an update request from the result of dispatching it'
     # Special for ws-driven edge case
-    if str(resp) == 'EDGECASEEXIT':
+    if isinstance(resp, str) and resp == 'EDGECASEEXIT':
         return HttpResponse("")
 
+    if isinstance(resp, StreamedJson):
+        # Streamed responses are not rewritten by middleware
+        return _compressed_response(request, StreamingHttpResponse(resp,
+                                                                   content_type="application/json"),
+                                    allow_brotli=False)
+
     # Change in returned value type
     try:
         rdata = resp.data
@@ -108,8 +305,62 @@ def _update(request, ident, stateless=False, **kwargs):
         rdata = resp
         rtype = "application/json"
 
-    return HttpResponse(rdata,
-                        content_type=rtype)
+    return _compressed_response(request, HttpResponse(rdata,
+                                                      content_type=rtype),
+                                allow_brotli=False)
+
+def _not_modified_response(request, etag, last_modified=None):
+    'Return a 304 response, carrying the validators, if the request is conditional and matches them, or None'
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def _compressed_response(request, response, allow_brotli=True):
+    '''
+    Compress the content of a response, if enabled by the compression_threshold setting and accepted by the client.
+
+    Brotli is used if allowed, the brotli package is installed and the client accepts it, and gzip otherwise. Streamed
+    responses are always compressed, using gzip, as their size is not known in advance. Gzip content is padded with
+    random bytes as is done by the Django GZipMiddleware. There is no such padding for brotli, so it is not allowed
+    for callback responses, which hold values sent by the client alongside those of the application.
+    '''
+    threshold = compression_threshold()
+    if threshold is None or response.has_header('Content-Encoding'):
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    use_brotli = (allow_brotli and brotli is not None and _accepts_brotli.search(accept_encoding) and
+                  not response.streaming)
+    if not use_brotli and not _accepts_gzip.search(accept_encoding):
+        return response
+
+    if response.streaming:
+        response.streaming_content = compress_sequence(response.streaming_content, **_gzip_padding)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        if len(response.content) < threshold:
+            return response
+        if use_brotli:
+            compressed = brotli.compress(response.content)
+        else:
+            compressed = compress_string(response.content, **_gzip_padding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = 'br' if use_brotli else 'gzip'
+
+    # The ETag identifies the uncompressed content, so is weakened as is done by the Django GZipMiddleware
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+    return response
 
 def main_view(request, ident, stateless=False, cache_id=None, **kwargs):
     'Main view for a dash app'
@@ -143,14 +394,15 @@ def component_suites(request, resource=None, component=None, extra_element="", c
 
     extra_path_part = f"{cpe2}/" if cpe2 else ""
 
-    get_params = request.GET.urlencode()
-    if get_params and False:
-        redone_url = static_path("dash/component/%s/%s%s%s?%s" %(component, extra_path_part, extra_element, resource, get_params))
-    else:
-        resource, _fingerprint = check_fingerprint(resource)
-        redone_url = static_path("dash/component/%s/%s%s%s" % (component, extra_path_part, extra_element, resource))
+    # Any query string, such as the version added by dash, is not passed on to the static file
+    resource, fingerprint = check_fingerprint(resource)
+    redone_url = static_path("dash/component/%s/%s%s%s" % (component, extra_path_part, extra_element, resource))
 
-    return HttpResponseRedirect(redirect_to=redone_url)
+    response = HttpResponseRedirect(redirect_to=redone_url)
+    if fingerprint:
+        # A fingerprinted resource never changes, so neither does the redirection
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
 
 def app_assets(request, **kwargs):
     'Return a local dash app asset, served up through the Django static framework'
@@ -23,6 +23,8 @@ setup(
     license='MIT',
     packages=[
     'django_plotly_dash',
+    'django_plotly_dash.management',
+    'django_plotly_dash.management.commands',
     'django_plotly_dash.migrations',
     'django_plotly_dash.templatetags',
     ],